@@ -2,26 +2,207 @@
 from flask import Flask, render_template, request, jsonify, session
 import uuid
 import json
+import gzip
+import zlib
+import hmac
 import os
 import logging
+import threading
+import time
 from datetime import timedelta
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 
 # Import custom modules
 from modules.conversation import FamilyDynamicsConversation
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from modules.model_router import get_all_metrics
+from modules.static_assets import StaticAssetPipeline
+from modules.transcript_log import TranscriptLog, purge_expired_transcripts
+from modules.log_config import setup_logging, log_message_event
+from modules.tracing import get_tracer
+from modules.memory_accounting import (
+    SessionMemoryAccountant,
+    MEMORY_SWEEP_INTERVAL,
+    start_tracemalloc,
+)
+
+# Set up non-blocking, structured logging
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "dev_key_for_testing")
 # Set session to be permanent with a longer lifetime
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(hours=24)
+# Largest request body accepted as sent (compressed or not)
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("FDA_MAX_CONTENT_LENGTH", 2 * 1024 * 1024))
+
+# Largest JSON body accepted after decompressing a gzipped request
+MAX_JSON_BODY = int(os.environ.get("FDA_MAX_JSON_BODY", 8 * 1024 * 1024))
+
+# Fingerprint and precompress static files at startup
+asset_pipeline = StaticAssetPipeline(
+    app.static_folder,
+    os.environ.get("FDA_ASSET_BUILD_DIR", os.path.join(app.root_path, "build", "static")),
+)
+asset_pipeline.init_app(app)
 
 # Initialize conversation sessions dictionary
 # Using a global variable for sessions (consider a proper DB for production)
 sessions = {}
 
+# Conversation transcripts are appended here so history survives restarts.
+# Set FDA_TRANSCRIPT_DIR to an empty string to keep history in memory only.
+TRANSCRIPT_DIR = os.environ.get("FDA_TRANSCRIPT_DIR", os.path.join(app.root_path, "transcripts"))
+
+# Transcripts untouched for this long are deleted; the default outlives the session cookie
+TRANSCRIPT_TTL_HOURS = float(os.environ.get("FDA_TRANSCRIPT_TTL_HOURS", 48))
+
+# Seconds between checks for expired transcripts
+TRANSCRIPT_PURGE_INTERVAL = 3600
+
+# Per-session memory accounting, swept in the background; also evicts idle sessions
+# over FDA_SESSION_MEMORY_LIMIT
+memory_accountant = SessionMemoryAccountant()
+start_tracemalloc()
+
+
+
+def start_background_task(name, interval, func):
+    """
+    Run a function now and then every interval seconds on a daemon thread.
+
+    Args:
+        name: Thread name
+        interval: Seconds between runs
+        func: Function called without arguments
+    """
+
+    def run():
+        while True:
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"Background task {name} failed: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+
+def purge_expired_sessions():
+    """Delete expired transcripts and drop the in-memory sessions they belonged to."""
+    removed = set(purge_expired_transcripts(TRANSCRIPT_DIR, TRANSCRIPT_TTL_HOURS * 3600))
+    if not removed:
+        return
+    for session_id, conversation in list(sessions.items()):
+        if conversation.transcript is not None and conversation.transcript.path in removed:
+            sessions.pop(session_id, None)
+            memory_accountant.forget(session_id)
+
+
+if TRANSCRIPT_DIR and TRANSCRIPT_TTL_HOURS > 0:
+    start_background_task("transcript-purge", TRANSCRIPT_PURGE_INTERVAL, purge_expired_sessions)
+
+if MEMORY_SWEEP_INTERVAL > 0:
+    start_background_task(
+        "memory-sweep", MEMORY_SWEEP_INTERVAL, lambda: memory_accountant.sweep(sessions)
+    )
+
+# Token that grants access to admin introspection routes outside debug mode,
+# sent as the X-Admin-Token header; unset leaves them debug-only
+ADMIN_TOKEN = os.environ.get("FDA_ADMIN_TOKEN", "")
+
+
+def is_admin_request():
+    """Check whether the request may use admin introspection routes."""
+    if app.debug:
+        return True
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+# Only compress JSON responses larger than this many bytes
+GZIP_MIN_SIZE = 500
+
+
+def get_request_json():
+    """
+    Parse the JSON request body, decompressing it if the client sent it gzipped.
+    Raises BadRequest for malformed bodies and RequestEntityTooLarge when the
+    decompressed body exceeds MAX_JSON_BODY.
+    """
+    if request.headers.get("Content-Encoding", "").lower() != "gzip":
+        return request.get_json(silent=True) or {}
+
+    # Decompress incrementally so a small body cannot expand without bound
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(request.get_data(), MAX_JSON_BODY)
+    except zlib.error:
+        raise BadRequest("Invalid gzip request body")
+    if decompressor.unconsumed_tail:
+        raise RequestEntityTooLarge("Decompressed request body is too large")
+    if not decompressor.eof:
+        raise BadRequest("Truncated gzip request body")
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise BadRequest("Invalid JSON request body")
+    return data if isinstance(data, dict) else {}
+
+
+@app.errorhandler(BadRequest)
+@app.errorhandler(RequestEntityTooLarge)
+def request_error(e):
+    """Report malformed or oversized request bodies as JSON."""
+    logger.warning(f"Rejected request to {request.path}: {e.description}")
+    return jsonify({"success": False, "error": e.description}), e.code
+
+
+@app.after_request
+def compress_response(response):
+    """Gzip JSON responses for clients that accept it."""
+    if (
+        response.direct_passthrough
+        or response.status_code != 200
+        or response.mimetype != "application/json"
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "").lower()
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def get_or_create_conversation(session_id, create=True):
+    """
+    Get the conversation for a session, creating it on first use.
+    Conversations are created lazily so page views that never chat cost nothing.
+    With create=False, only an existing or resumable conversation is returned.
+    """
+    conversation = sessions.get(session_id)
+    if conversation is None:
+        logger.info(f"Creating conversation for session: {session_id}")
+        # Resumes from the session's transcript if one exists
+        conversation = FamilyDynamicsConversation(
+            session_id=session_id, transcript_dir=TRANSCRIPT_DIR
+        )
+        if not conversation.conversation_history:
+            if not create:
+                return None
+            # Initialize the conversation with a greeting
+            conversation.process_user_input("__init__")
+        sessions[session_id] = conversation
+    memory_accountant.touch(session_id)
+    return conversation
+
 
 @app.route("/")
 def index():
@@ -31,27 +212,14 @@ def index():
     # Make session permanent to extend its lifetime
     session.permanent = True
 
-    # Create a unique session ID if not exists
+    # Create a unique session ID if not exists; the conversation itself is
+    # only created on the first chat message
     if "session_id" not in session:
         session_id = str(uuid.uuid4())
         session["session_id"] = session_id
         logger.info(f"Creating new session: {session_id}")
-
-        # Initialize a new conversation for this session
-        sessions[session_id] = FamilyDynamicsConversation()
-
-        # Initialize the conversation with a greeting
-        sessions[session_id].process_user_input("__init__")
     else:
-        session_id = session["session_id"]
-        logger.info(f"Using existing session: {session_id}")
-
-        # Make sure the session exists in our sessions dictionary
-        if session_id not in sessions:
-            logger.warning(f"Recreating missing session: {session_id}")
-            sessions[session_id] = FamilyDynamicsConversation()
-            # Initialize the conversation with a greeting
-            sessions[session_id].process_user_input("__init__")
+        logger.info(f"Using existing session: {session['session_id']}")
 
     return render_template("index.html")
 
@@ -59,12 +227,11 @@ def index():
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """Process user messages and return AI responses."""
-    data = request.json
+    data = get_request_json()
     user_input = data.get("message", "")
     session_id = session.get("session_id")
 
-    logger.info(f"Chat endpoint - Session ID: {session_id}")
-    logger.info(f"User input: {user_input}")
+    log_message_event(logger, "chat.user_input", session_id, user_input)
 
     # Check if session exists
     if not session_id:
@@ -73,18 +240,19 @@ def chat():
         session_id = str(uuid.uuid4())
         session["session_id"] = session_id
         session.permanent = True
-        sessions[session_id] = FamilyDynamicsConversation()
-    elif session_id not in sessions:
-        logger.warning(f"Session ID {session_id} not found in sessions dictionary")
-        # Recreate the session
-        sessions[session_id] = FamilyDynamicsConversation()
 
     try:
-        # Process the message with the conversation manager
-        conversation = sessions[session_id]
-        response = conversation.process_user_input(user_input)
+        with get_tracer().start_as_current_span("http.chat") as span:
+            with get_tracer().start_as_current_span("session.lookup"):
+                conversation = get_or_create_conversation(session_id)
+            span.set_attribute("session.resident_count", len(sessions))
+
+            # Process the message with the conversation manager
+            response = conversation.process_user_input(user_input)
 
-        logger.info(f"AI response for session {session_id}: {response[:30]}...")
+        log_message_event(
+            logger, "chat.response", session_id, response, phase=conversation.current_phase
+        )
         return jsonify({"response": response, "phase": conversation.current_phase})
     except Exception as e:
         logger.error(f"Error processing chat: {str(e)}")
@@ -106,10 +274,15 @@ def save_conversation():
     session_id = session.get("session_id")
     logger.info(f"Save endpoint - Session ID: {session_id}")
 
+    # The client sends the version of its saved copy so only changes are returned;
+    # malformed bodies are rejected with 400 before any work is done
+    client_version = get_request_json().get("version")
+
     try:
-        # Ensure user has a session ID
-        if not session_id:
-            logger.warning("No session ID found in request")
+        # Ensure user has a session ID with an active conversation
+        conversation = get_or_create_conversation(session_id, create=False) if session_id else None
+        if conversation is None:
+            logger.warning("No active conversation found for request")
             return (
                 jsonify(
                     {
@@ -122,9 +295,19 @@ def save_conversation():
             )
 
         # Save the conversation data
-        result = sessions[session_id].save_conversation(session_id)
-        logger.info(f"Save result: {result}")
-        return jsonify(result)
+        with get_tracer().start_as_current_span("http.save"):
+            result = conversation.save_conversation(session_id, client_version)
+        logger.info(f"Save result: {result.get('extraction_status')}")
+
+        if result.get("unchanged"):
+            response = app.response_class(status=304)
+            response.set_etag(result["version"]["etag"])
+            return response
+
+        response = jsonify(result)
+        if "data" in result:
+            response.set_etag(result["data"]["etag"])
+        return response
 
     except Exception as e:
         logging.error(f"Error saving conversation: {e}")
@@ -135,24 +318,60 @@ def save_conversation():
 def load_context():
     """
     Load saved conversation data into the current session.
-    This endpoint is called by the frontend when saved data is detected.
+    This endpoint is called by the frontend when saved data is detected. The
+    client first sends only {"version": {lineage, revision, etag, phase}}; if
+    the session does not hold that data, "needs_data" asks for the full
+    "saved_data".
     """
     session_id = session.get("session_id")
     logger.info(f"Load context endpoint - Session ID: {session_id}")
 
+    # Get the saved data, or just its version, from the request
+    data = get_request_json()
+
     try:
-        # Get the saved data from the request
-        data = request.json
         saved_data = data.get("saved_data")
+        client_version = saved_data or data.get("version")
 
-        if not saved_data:
+        if not client_version:
             logger.warning("No saved data provided in request")
             return jsonify({"success": False, "error": "No saved data provided"})
 
+        # Skip the upload and rebuild if this session, in memory or in its
+        # transcript, already holds exactly the client's data
+        conversation = get_or_create_conversation(session_id, create=False) if session_id else None
+        if conversation and conversation.matches_client_version(client_version):
+            logger.info(f"Saved data unchanged for session {session_id}")
+            last_response = next(
+                (
+                    msg["content"]
+                    for msg in reversed(conversation.conversation_history)
+                    if msg["role"] == "assistant"
+                ),
+                None,
+            )
+            return jsonify(
+                {
+                    "success": True,
+                    "unchanged": True,
+                    "message": "Context already loaded",
+                    "response": last_response,
+                    "phase": conversation.current_phase,
+                    "version": conversation.data_extractor.get_version(),
+                }
+            )
+
+        # Only a version was sent and it does not match: ask for the data itself
+        if not saved_data:
+            return jsonify({"success": False, "needs_data": True})
+
         logger.info(f"Loading saved data into session {session_id}")
 
         # Create a new conversation with the saved data
-        sessions[session_id] = FamilyDynamicsConversation(saved_data=saved_data)
+        sessions[session_id] = FamilyDynamicsConversation(
+            saved_data=saved_data, session_id=session_id, transcript_dir=TRANSCRIPT_DIR
+        )
+        memory_accountant.touch(session_id)
 
         # Get the initial greeting which will be personalized
         response = sessions[session_id].process_user_input("__init__")
@@ -163,6 +382,7 @@ def load_context():
                 "message": "Context loaded successfully",
                 "response": response,
                 "phase": sessions[session_id].current_phase,
+                "version": sessions[session_id].data_extractor.get_version(),
             }
         )
 
@@ -171,16 +391,42 @@ def load_context():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Longest a request may wait for a precomputed greeting, in seconds. Kept short
+# so a sync worker is not held; clients poll again while it is pending
+WELCOME_BACK_MAX_WAIT = 1
+
+
+@app.route("/api/welcome_back", methods=["GET"])
+def welcome_back():
+    """
+    Return the welcome-back greeting precomputed after the last save, so the
+    client can store it with its saved data. The optional "wait" query
+    parameter waits up to that many seconds (at most WELCOME_BACK_MAX_WAIT)
+    for it to finish; otherwise "pending" tells the client to poll again.
+    """
+    session_id = session.get("session_id")
+    conversation = sessions.get(session_id) if session_id else None
+    if conversation is None:
+        return jsonify({"success": False, "error": "No active conversation found"}), 404
+
+    wait = min(max(request.args.get("wait", 0, type=float), 0), WELCOME_BACK_MAX_WAIT)
+    greeting = conversation.get_welcome_back(timeout=wait)
+    if greeting is None:
+        return jsonify({"success": False, "pending": True})
+    return jsonify({"success": True, "welcome_back": greeting})
+
+
 @app.route("/api/reset", methods=["POST"])
 def reset_conversation():
     """Reset the current conversation."""
     session_id = session.get("session_id")
 
     if session_id:
-        # Create a new conversation instance
-        sessions[session_id] = FamilyDynamicsConversation()
-        # Initialize the conversation with a greeting
-        sessions[session_id].process_user_input("__init__")
+        # Drop the conversation and its transcript; a new one is created on the next chat message
+        sessions.pop(session_id, None)
+        memory_accountant.forget(session_id)
+        if TRANSCRIPT_DIR:
+            TranscriptLog(TRANSCRIPT_DIR, session_id).clear()
         logger.info(f"Reset session: {session_id}")
 
     return jsonify({"status": "success"})
@@ -201,6 +447,30 @@ def debug_sessions():
     return jsonify({"error": "Debug mode is not enabled"}), 403
 
 
+@app.route("/api/debug/models", methods=["GET"])
+def debug_models():
+    """Debug route to see latency and token usage per model."""
+    if app.debug:
+        return jsonify({"models": get_all_metrics()})
+    return jsonify({"error": "Debug mode is not enabled"}), 403
+
+
+@app.route("/api/debug/memory", methods=["GET"])
+def debug_memory():
+    """
+    Admin route to see approximate memory per session. Available in debug mode
+    or with an X-Admin-Token header matching FDA_ADMIN_TOKEN. Query parameters: top (number of sessions listed) and tracemalloc=1 to
+    include a tracemalloc snapshot and its diff from the previous one.
+    """
+    if is_admin_request():
+        top_n = request.args.get("top", 10, type=int)
+        result = memory_accountant.report(sessions, top_n)
+        if request.args.get("tracemalloc") == "1":
+            result["tracemalloc"] = memory_accountant.tracemalloc_snapshot(top_n)
+        return jsonify(result)
+    return jsonify({"error": "Admin access required"}), 403
+
+
 if __name__ == "__main__":
     # Get port from environment variable or default to 10000
     port = int(os.environ.get("PORT", 10000))
@@ -0,0 +1,162 @@
+# bench/log_overhead.py
+"""
+Measure what logging adds to a chat request.
+
+Each configuration runs in its own process, since logging is configured once
+per process. The process sends chat messages through the Flask test client to
+/api/chat with the model stubbed out, writing logs to a file. Configurations
+are run round-robin several times, and the lowest mean request time of the
+runs is reported (as timeit does, to filter out noise) with the bytes written:
+
+    python bench/log_overhead.py [--requests 3000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import types
+import logging
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USER_INPUT = "My father rarely speaks at dinner and my mother does all the talking. " * 3
+RESPONSE = "It sounds like your parents have settled into very different roles at the table. " * 6
+
+# Requests per conversation before it is reset, so history size stays comparable
+TURNS_PER_CONVERSATION = 50
+
+# Configurations compared: name -> (logging setup, environment)
+CONFIGS = {
+    "synchronous, sample rate 1.0": ("sync", {"FDA_LOG_SAMPLE_RATE": "1"}),
+    "queue, sample rate 1.0": ("queue", {"FDA_LOG_SAMPLE_RATE": "1"}),
+    "queue, sample rate 0.1": ("queue", {"FDA_LOG_SAMPLE_RATE": "0.1"}),
+    "logging off": ("off", {}),
+}
+
+
+class StubMessages:
+    """Answers every call immediately with a fixed response."""
+
+    def create(self, **kwargs):
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=RESPONSE)],
+            usage=types.SimpleNamespace(input_tokens=100, output_tokens=50),
+        )
+
+
+class StubClient:
+    def __init__(self):
+        self.messages = StubMessages()
+
+    def with_options(self, **kwargs):
+        return self
+
+
+def configure_logging(setup: str, path: str) -> None:
+    """Replace setup_logging before the app imports it."""
+    import modules.log_config as log_config
+
+    if setup == "sync":
+        # Same JSON output, formatted and written on the request thread with stock logging
+        def setup_sync(level=logging.INFO, stream=None):
+            logging.basicConfig(level=level, filename=path)
+            logging.getLogger().handlers[0].setFormatter(log_config.JsonFormatter())
+
+        log_config.setup_logging = setup_sync
+    elif setup == "off":
+        log_config.setup_logging = lambda level=logging.INFO, stream=None: logging.disable(
+            logging.CRITICAL
+        )
+    else:
+        setup_logging = log_config.setup_logging
+        stream = open(path, "w")
+        log_config.setup_logging = lambda level=logging.INFO, stream_=None: setup_logging(level, stream)
+
+
+def run_requests(setup: str, requests: int, path: str) -> float:
+    """Send chat requests through the test client; return the mean seconds per request."""
+    configure_logging(setup, path)
+
+    import app as app_module
+    from modules.log_config import stop_logging
+    from modules.model_router import get_router
+
+    get_router(os.environ["ANTHROPIC_API_KEY"])._client = StubClient()
+    client = app_module.app.test_client()
+    client.get("/")
+
+    # Warm up caches and the first conversation
+    for _ in range(TURNS_PER_CONVERSATION):
+        client.post("/api/chat", json={"message": USER_INPUT})
+    client.post("/api/reset")
+
+    elapsed = 0.0
+    for i in range(requests):
+        start = time.perf_counter()
+        client.post("/api/chat", json={"message": USER_INPUT})
+        elapsed += time.perf_counter() - start
+        if (i + 1) % TURNS_PER_CONVERSATION == 0:
+            client.post("/api/reset")
+
+    # Records still queued are written here, off the timed requests, which
+    # matches a server where the listener catches up between requests
+    stop_logging()
+    logging.shutdown()
+    return elapsed / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--setup", choices=["sync", "queue", "off"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        print(run_requests(args.setup, args.requests, args.output))
+        return
+
+    results = {name: [] for name in CONFIGS}
+    sizes = {}
+    for _ in range(args.repeat):
+        for name, (setup, env) in CONFIGS.items():
+            results[name].append(run_config(setup, env, args.requests, sizes, name))
+
+    for name, timings in results.items():
+        print(
+            f"{name:30} {min(timings) * 1e6:8.1f} us/request "
+            f"{sizes[name] / 1024:10.0f} KB written"
+        )
+
+
+def run_config(setup: str, env: dict, requests: int, sizes: dict, name: str) -> float:
+    """Run one configuration in a fresh process; return its mean seconds per request."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "log.txt")
+        result = subprocess.run(
+            [
+                sys.executable, __file__, "--setup", setup,
+                "--requests", str(requests), "--output", output,
+            ],
+            env={
+                **os.environ,
+                "ANTHROPIC_API_KEY": "bench",
+                "FDA_TRANSCRIPT_DIR": "",
+                "FDA_MEMORY_SWEEP_INTERVAL": "0",
+                "FDA_ASSET_BUILD_DIR": os.path.join(directory, "assets"),
+                **env,
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        sizes[name] = os.path.getsize(output) if os.path.exists(output) else 0
+        return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# modules/cassette.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+# "record" captures real API traffic, "replay" serves it back offline, anything else is off
+CASSETTE_MODE = os.environ.get("FDA_LLM_CASSETTE_MODE", "").lower()
+
+# JSON-lines file interactions are recorded to and replayed from
+CASSETTE_PATH = os.environ.get("FDA_LLM_CASSETTE", "llm_cassette.jsonl")
+
+# "preserve" sleeps for the recorded latency on replay, "strip" returns immediately
+CASSETTE_LATENCY = os.environ.get("FDA_LLM_CASSETTE_LATENCY", "strip").lower()
+
+# Request fields that identify an interaction
+REQUEST_FIELDS = ("model", "system", "messages", "max_tokens", "temperature")
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when no recorded interaction matches a request."""
+
+
+class Cassette:
+    """
+    Stores request/response pairs for messages.create calls in a JSON-lines file.
+    Identical requests are replayed in the order they were recorded; once they run
+    out, the last response is repeated.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a cassette, loading any interactions already recorded.
+
+        Args:
+            path: Cassette file path
+        """
+        self.path = path
+        self._interactions = {}  # Request key -> list of (response, latency)
+        self._positions = {}  # Request key -> next interaction to replay
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._interactions.setdefault(entry["key"], []).append(
+                            (entry["response"], entry["latency"])
+                        )
+
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Stable hash of the fields that identify a request."""
+        identity = {field: request.get(field) for field in REQUEST_FIELDS}
+        canonical = json.dumps(identity, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def record(self, request: Dict[str, Any], response: Dict[str, Any], latency: float) -> None:
+        """
+        Append an interaction to the cassette.
+
+        Args:
+            request: messages.create keyword arguments
+            response: The response serialized as a dictionary
+            latency: Seconds the call took
+        """
+        key = self.request_key(request)
+        entry = {
+            "key": key,
+            "request": {field: request.get(field) for field in REQUEST_FIELDS},
+            "response": response,
+            "latency": latency,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._interactions.setdefault(key, []).append((response, latency))
+
+    def play(self, request: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        """
+        Find the recorded response for a request.
+
+        Args:
+            request: messages.create keyword arguments
+
+        Returns:
+            Tuple of the serialized response and its recorded latency
+        """
+        key = self.request_key(request)
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise CassetteMiss(f"No recorded interaction for request {key[:12]} in {self.path}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return interactions[min(position, len(interactions) - 1)]
+
+
+class _CassetteMessages:
+    """Stands in for client.messages, recording or replaying create() calls."""
+
+    def __init__(self, owner: "CassetteClient"):
+        self._owner = owner
+
+    def create(self, **request):
+        owner = self._owner
+        if owner.mode == "replay":
+            response, latency = owner.cassette.play(request)
+            if owner.preserve_latency:
+                time.sleep(latency)
+            from anthropic.types import Message
+
+            return Message.model_validate(response)
+
+        start = time.perf_counter()
+        message = owner.client.messages.create(**request)
+        owner.cassette.record(request, message.model_dump(mode="json"), time.perf_counter() - start)
+        return message
+
+
+class CassetteClient:
+    """
+    Wraps an Anthropic client so messages.create calls are recorded to or
+    replayed from a cassette. In replay mode no real client is created.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str, client=None, preserve_latency: bool = False):
+        """
+        Initialize the wrapper.
+
+        Args:
+            cassette: Cassette to record to or replay from
+            mode: "record" or "replay"
+            client: The real Anthropic client (required when recording)
+            preserve_latency: Sleep for the recorded latency when replaying
+        """
+        self.cassette = cassette
+        self.mode = mode
+        self.client = client
+        self.preserve_latency = preserve_latency
+        self.messages = _CassetteMessages(self)
+
+    def with_options(self, **options) -> "CassetteClient":
+        """Mirror Anthropic.with_options, keeping the same cassette."""
+        client = self.client.with_options(**options) if self.client is not None else None
+        return CassetteClient(self.cassette, self.mode, client, self.preserve_latency)
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def wrap_client(
+    client_factory: Callable[[], Any],
+    mode: Optional[str] = None,
+    path: Optional[str] = None,
+    preserve_latency: Optional[bool] = None,
+):
+    """
+    Create an API client, wrapped in a cassette when recording or replaying.
+
+    Args:
+        client_factory: Creates the real Anthropic client
+        mode: "record", "replay" or None to use FDA_LLM_CASSETTE_MODE
+        path: Cassette file, defaults to FDA_LLM_CASSETTE
+        preserve_latency: Replay recorded latency, defaults to FDA_LLM_CASSETTE_LATENCY
+
+    Returns:
+        The real client, or a CassetteClient
+    """
+    mode = CASSETTE_MODE if mode is None else mode
+    if mode not in ("record", "replay"):
+        return client_factory()
+
+    path = path or CASSETTE_PATH
+    if preserve_latency is None:
+        preserve_latency = CASSETTE_LATENCY == "preserve"
+
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+
+    logging.info(f"LLM cassette in {mode} mode: {path}")
+    client = client_factory() if mode == "record" else None
+    return CassetteClient(cassette, mode, client, preserve_latency)
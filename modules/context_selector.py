@@ -0,0 +1,204 @@
+# modules/context_selector.py
+import os
+import re
+import heapq
+from typing import Dict, Any, List, Optional, Iterable
+
+# Approximate number of prompt tokens the saved family context may use
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FDA_CONTEXT_TOKEN_BUDGET", 800))
+
+# How relevant each category is to each phase
+PHASE_CATEGORY_WEIGHTS = {
+    "initial_data_collection": {
+        "family_members": 1.0,
+        "relationships": 0.8,
+        "events": 0.5,
+        "dynamics": 0.4,
+    },
+    "deep_dive": {
+        "family_members": 0.6,
+        "relationships": 0.8,
+        "events": 0.6,
+        "dynamics": 1.0,
+    },
+    "analysis": {
+        "family_members": 0.5,
+        "relationships": 0.9,
+        "events": 0.8,
+        "dynamics": 1.0,
+    },
+}
+
+# Score contributions
+RECENCY_WEIGHT = 1.0
+MENTION_WEIGHT = 2.0
+PHASE_WEIGHT = 1.5
+
+# Section headers, in the order sections appear in the prompt
+SECTION_TITLES = {
+    "family_members": "FAMILY MEMBERS",
+    "relationships": "RELATIONSHIPS",
+    "dynamics": "DYNAMICS",
+    "events": "SIGNIFICANT EVENTS",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a piece of text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _format_member(member: Dict[str, Any]) -> Optional[str]:
+    details = []
+    if member.get("name"):
+        details.append(f"name: {member['name']}")
+    if member.get("role"):
+        details.append(f"role: {member['role']}")
+    if member.get("age"):
+        details.append(f"age: {member['age']}")
+    if member.get("attributes"):
+        details.append(f"attributes: {', '.join(member['attributes'])}")
+    return " - " + "; ".join(details) if details else None
+
+
+def _format_relationship(rel: Dict[str, Any]) -> Optional[str]:
+    details = []
+    if rel.get("type"):
+        details.append(f"type: {rel['type']}")
+    if rel.get("members"):
+        details.append(f"between: {', '.join(rel['members'])}")
+    if rel.get("quality"):
+        details.append(f"quality: {rel['quality']}")
+    return " - " + "; ".join(details) if details else None
+
+
+def _format_dynamic(dyn: Dict[str, Any]) -> Optional[str]:
+    if dyn.get("type") and dyn.get("pattern"):
+        return f" - {dyn['type']}: {dyn['pattern']}"
+    return None
+
+
+def _format_event(event: Dict[str, Any]) -> Optional[str]:
+    if event.get("type") and event.get("description"):
+        return f" - {event['type']}: {event['description']}"
+    return None
+
+
+FORMATTERS = {
+    "family_members": _format_member,
+    "relationships": _format_relationship,
+    "dynamics": _format_dynamic,
+    "events": _format_event,
+}
+
+
+class FamilyContextSelector:
+    """
+    Selects the most relevant saved family facts for the system prompt.
+    Facts are scored by recency, by mentions of their members in recent turns
+    and by how relevant their category is to the current phase, then the top
+    facts are included until the token budget is used up.
+    """
+
+    def __init__(self, extracted_data: Dict[str, Any]):
+        """
+        Format every fact once and index them by the members they involve.
+
+        Args:
+            extracted_data: Saved family data with family_members, relationships,
+                dynamics and events lists
+        """
+        # Each fact: (category, position, text, tokens, recency)
+        self.facts = []
+        # Member key (lowercased name or role) -> fact ids involving that member
+        self.member_index = {}
+
+        for category, formatter in FORMATTERS.items():
+            items = [item for item in extracted_data.get(category, []) if isinstance(item, dict)]
+            for position, item in enumerate(items):
+                text = formatter(item)
+                if not text:
+                    continue
+                fact_id = len(self.facts)
+                recency = (position + 1) / len(items)
+                self.facts.append((category, position, text, estimate_tokens(text), recency))
+
+                if category == "family_members":
+                    keys = [item.get("name"), item.get("role")]
+                else:
+                    keys = item.get("members") or []
+                for key in keys:
+                    if isinstance(key, str) and key.strip():
+                        self.member_index.setdefault(key.strip().lower(), set()).add(fact_id)
+
+    def _mentioned_facts(self, recent_turns: Iterable[str]) -> set:
+        """Find the facts whose members are mentioned in the recent turns."""
+        text = " ".join(recent_turns).lower()
+        if not text:
+            return set()
+
+        words = set(_WORD_RE.findall(text))
+        mentioned = set()
+        for key, fact_ids in self.member_index.items():
+            if (key in words) if " " not in key else (key in text):
+                mentioned |= fact_ids
+        return mentioned
+
+    def select(
+        self,
+        phase: str,
+        recent_turns: Iterable[str] = (),
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        category_weights: Optional[Dict[str, float]] = None,
+    ) -> List[str]:
+        """
+        Build context sections from the highest scoring facts that fit the budget.
+
+        Args:
+            phase: Current conversation phase
+            recent_turns: Text of recent messages, used to boost mentioned members
+            token_budget: Approximate token budget for the selected facts
+            category_weights: Optional category weights replacing the phase's defaults
+
+        Returns:
+            Formatted context sections, e.g. "FAMILY MEMBERS:\\n - name: ..."
+        """
+        if category_weights is None:
+            category_weights = PHASE_CATEGORY_WEIGHTS.get(
+                phase, PHASE_CATEGORY_WEIGHTS["initial_data_collection"]
+            )
+        mentioned = self._mentioned_facts(recent_turns)
+
+        heap = []
+        for fact_id, (category, _, _, _, recency) in enumerate(self.facts):
+            score = (
+                RECENCY_WEIGHT * recency
+                + PHASE_WEIGHT * category_weights.get(category, 0.0)
+                + (MENTION_WEIGHT if fact_id in mentioned else 0.0)
+            )
+            heap.append((-score, fact_id))
+        heapq.heapify(heap)
+
+        # Take facts in score order while they fit
+        selected = []
+        remaining = token_budget
+        while heap and remaining > 0:
+            _, fact_id = heapq.heappop(heap)
+            tokens = self.facts[fact_id][3]
+            if tokens <= remaining:
+                selected.append(fact_id)
+                remaining -= tokens
+
+        # Present the selected facts grouped by category in their original order
+        grouped = {category: [] for category in SECTION_TITLES}
+        for fact_id in sorted(selected):
+            category, _, text, _, _ = self.facts[fact_id]
+            grouped[category].append(text)
+
+        return [
+            f"{SECTION_TITLES[category]}:\n" + "\n".join(lines)
+            for category, lines in grouped.items()
+            if lines
+        ]
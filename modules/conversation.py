@@ -1,184 +1,39 @@
 # modules/conversation.py
 import os
+import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from modules.data_extractor import FamilyDataExtractor
-from typing import Dict, Any, Optional
+from modules.model_router import get_router
+from modules.conversation_state import ConversationState
+from modules.transcript_log import TranscriptLog
+from modules.tracing import traced, get_current_span
+from modules.context_selector import FamilyContextSelector, CONTEXT_TOKEN_BUDGET, estimate_tokens
+from collections import deque
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-class FamilyDynamicsConversation:
-    """
-    Manages the conversation flow using Claude AI as the backend.
-    Handles conversation state, history, and LLM interactions.
-    """
-
-    def __init__(self, saved_data: Optional[Dict[str, Any]] = None):
-        """
-        Initialize a new conversation session.
-
-        Args:
-            saved_data: Optional previously saved data to restore conversation context
-        """
-        self.conversation_history = []
-        self.current_phase = "initial_data_collection"
-        self.api_key = os.environ.get("ANTHROPIC_API_KEY")
-        logging.info("Initializing conversation")
-
-        if not self.api_key:
-            raise ValueError(
-                "API key not configured. Please set the ANTHROPIC_API_KEY environment variable."
-            )
-
-        # Extract family data from user input
-        self.data_extractor = FamilyDataExtractor()
-
-        # Set saved data if provided
-        self.saved_data = None
-        if saved_data:
-            self.load_saved_data(saved_data)
+# Number of recent messages kept in memory when a transcript log is available
+HISTORY_TAIL = int(os.environ.get("FDA_HISTORY_TAIL", 10))
 
-        # Add initial system message to guide the LLM
-        system_prompt = self._get_system_prompt()
+# Number of recent user messages used to rank saved family context
+RECENT_TURNS_FOR_CONTEXT = 4
 
-        # Add context from saved data if available
-        if self.saved_data:
-            system_prompt = self._enhance_prompt_with_saved_data(system_prompt)
-            # Update phase if available
-            if "phase" in self.saved_data:
-                self.current_phase = self.saved_data["phase"]
-
-        self._add_system_message(system_prompt)
-
-    def _enhance_prompt_with_saved_data(self, base_prompt: str) -> str:
-        """
-        Enhance the system prompt with previously saved conversation data.
-
-        Args:
-            base_prompt: The original system prompt
+# Phase in which derived family structure is added to the saved context
+STRUCTURE_PHASE = "analysis"
 
-        Returns:
-            Enhanced prompt with previously saved context
-        """
-        if not self.saved_data or not self.saved_data.get("extracted_data"):
-            return base_prompt
-
-        # Get the extracted data
-        extracted_data = self.saved_data.get("extracted_data", {})
-
-        # Build context section based on saved data
-        context_sections = []
-
-        # Add family members if available
-        family_members = extracted_data.get("family_members", [])
-        if family_members:
-            member_details = []
-            for member in family_members:
-                details = []
-                if member.get("name"):
-                    details.append(f"name: {member['name']}")
-                if member.get("role"):
-                    details.append(f"role: {member['role']}")
-                if member.get("age"):
-                    details.append(f"age: {member['age']}")
-                if member.get("attributes"):
-                    attrs = ", ".join(member["attributes"])
-                    details.append(f"attributes: {attrs}")
-
-                if details:
-                    member_details.append(" - " + "; ".join(details))
-
-            if member_details:
-                context_sections.append("FAMILY MEMBERS:\n" + "\n".join(member_details))
-
-        # Add relationships if available
-        relationships = extracted_data.get("relationships", [])
-        if relationships:
-            rel_details = []
-            for rel in relationships:
-                details = []
-                if rel.get("type"):
-                    details.append(f"type: {rel['type']}")
-                if rel.get("members"):
-                    members = ", ".join(rel["members"])
-                    details.append(f"between: {members}")
-                if rel.get("quality"):
-                    details.append(f"quality: {rel['quality']}")
-
-                if details:
-                    rel_details.append(" - " + "; ".join(details))
-
-            if rel_details:
-                context_sections.append("RELATIONSHIPS:\n" + "\n".join(rel_details))
-
-        # Add dynamics if available
-        dynamics = extracted_data.get("dynamics", [])
-        if dynamics:
-            dyn_details = []
-            for dyn in dynamics:
-                if dyn.get("type") and dyn.get("pattern"):
-                    dyn_details.append(f" - {dyn['type']}: {dyn['pattern']}")
-
-            if dyn_details:
-                context_sections.append("DYNAMICS:\n" + "\n".join(dyn_details))
-
-        # Add events if available
-        events = extracted_data.get("events", [])
-        if events:
-            event_details = []
-            for event in events:
-                if event.get("type") and event.get("description"):
-                    event_details.append(f" - {event['type']}: {event['description']}")
-
-            if event_details:
-                context_sections.append(
-                    "SIGNIFICANT EVENTS:\n" + "\n".join(event_details)
-                )
-
-        # Combine all sections into a context block
-        if context_sections:
-            context_block = (
-                """
-        IMPORTANT: The user is returning to a previous conversation. Here is what we know about their family:
-        
-        """
-                + "\n\n".join(context_sections)
-                + """
-        
-        Based on this information, acknowledge their return and ask a relevant follow-up question about 
-        something specific from the information above. Do not overwhelm them with all these details at once.
-        Focus on one area they might want to explore further.
-        """
-            )
-            # Add the context block before the base prompt
-            enhanced_prompt = context_block + "\n\n" + base_prompt
-            return enhanced_prompt
-
-        return base_prompt
-
-    def load_saved_data(self, saved_data: Dict[str, Any]) -> None:
-        """
-        Load saved data from a previous conversation.
+# Category weights used alongside the structure summary: relationships and
+# dynamics it partly covers are still included, but rank below members and events
+STRUCTURE_CATEGORY_WEIGHTS = {
+    "family_members": 0.5,
+    "relationships": 0.3,
+    "events": 0.8,
+    "dynamics": 0.3,
+}
 
-        Args:
-            saved_data: Dictionary containing saved conversation data
-        """
-        logging.info("Loading saved data into conversation")
-        self.saved_data = saved_data
-
-        # Update current phase if available
-        if "phase" in saved_data:
-            self.current_phase = saved_data["phase"]
-            logging.info(f"Restored conversation phase: {self.current_phase}")
-
-        # If we have extracted data, update the data extractor
-        if "extracted_data" in saved_data:
-            extracted_data = saved_data["extracted_data"]
-            self.data_extractor.set_data(extracted_data)
-            logging.info("Restored extracted family data")
-
-    def _get_system_prompt(self):
-        """Return the system prompt for Claude with guidance to reference psychological theories and books."""
-        logging.info("Generating system prompt with theoretical references")
-        return """
+# The system prompt and greeting are immutable and shared by every conversation
+SYSTEM_PROMPT = """
         You are a family dynamics expert guiding users to explore and understand their family relationships.
 
         Base every response in established psychological theories, citing relevant experts and works. Draw from the following, but feel free to reference any other more relevant theory in your responses:
@@ -260,18 +115,302 @@ class FamilyDynamicsConversation:
         Your purpose is to illuminate specific behavioral patterns—not to provide general support or surface-level discussion. Always guide with intention.
         """
 
-    def _add_system_message(self, content):
-        """Add a system message to the conversation history."""
-        self.conversation_history.append({"role": "system", "content": content})
+INITIAL_GREETING = (
+    "Hello! I'm here to help you explore and understand your family dynamics. "
+    "Let's start by learning about your family members. Could you tell me who makes up your immediate family?"
+)
+
+WELCOME_BACK_FALLBACK = (
+    "Welcome back to our conversation about your family dynamics! What would you like to explore today?"
+)
+
+# Threads that precompute welcome-back greetings after a save
+WELCOME_BACK_WORKERS = int(os.environ.get("FDA_WELCOME_BACK_WORKERS", 2))
+
+_welcome_back_executor = None
+_welcome_back_lock = threading.Lock()
+
+
+def _get_welcome_back_executor() -> ThreadPoolExecutor:
+    """Create the shared greeting executor on first use."""
+    global _welcome_back_executor
+    with _welcome_back_lock:
+        if _welcome_back_executor is None:
+            _welcome_back_executor = ThreadPoolExecutor(
+                max_workers=WELCOME_BACK_WORKERS, thread_name_prefix="welcome-back"
+            )
+        return _welcome_back_executor
+
+
+class FamilyDynamicsConversation:
+    """
+    Manages the conversation flow using Claude AI as the backend.
+    Handles conversation state, history, and LLM interactions.
+    """
+
+    def __init__(
+        self,
+        saved_data: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+        transcript_dir: Optional[str] = None,
+    ):
+        """
+        Initialize a new conversation session.
+
+        Args:
+            saved_data: Optional previously saved data to restore conversation context
+            session_id: Optional session identifier used to name the transcript log
+            transcript_dir: Optional directory for transcript logs. When set, only the
+                last HISTORY_TAIL messages stay in memory and an existing transcript
+                for the session is resumed.
+        """
+        self.transcript = None
+        if session_id and transcript_dir:
+            self.transcript = TranscriptLog(transcript_dir, session_id)
+
+        # Recent messages; older ones are read back from the transcript on demand
+        tail_length = HISTORY_TAIL if self.transcript is not None else None
+        self.conversation_history = deque(maxlen=tail_length)
+        self.state = ConversationState(self._get_system_prompt())
+        self.api_key = os.environ.get("ANTHROPIC_API_KEY")
+        logging.info("Initializing conversation")
+
+        if not self.api_key:
+            raise ValueError(
+                "API key not configured. Please set the ANTHROPIC_API_KEY environment variable."
+            )
+
+        # The data extractor and context selector are created on first use
+        self._data_extractor = None
+        self._context_selector = None
+
+        # Welcome-back greeting being precomputed for the last save, and its key
+        self._welcome_back = None
+        self._welcome_back_key = None
+
+        # Version of the extracted data last written to the transcript
+        self._persisted_version = None
+
+        # Set saved data if provided, starting a fresh transcript
+        self.saved_data = None
+        if saved_data:
+            self.load_saved_data(saved_data)
+            if self.transcript is not None:
+                self.transcript.clear()
+                self.transcript.append_state(saved_data=saved_data)
+                self._persisted_version = self.data_extractor.get_version()
+        elif self.transcript is not None and len(self.transcript):
+            self._resume_from_transcript()
+
+        # Add context from saved data to the system prompt if available
+        if self.saved_data:
+            self.state.set_base_prompt(
+                self._enhance_prompt_with_saved_data(self.state.base_prompt)
+            )
+
+    def _resume_from_transcript(self) -> None:
+        """Restore saved data, extracted data, phase, counters and recent history from the transcript log."""
+        logging.info("Resuming conversation from transcript")
+        state = self.transcript.read_state()
+        if state.get("saved_data"):
+            self.load_saved_data(state["saved_data"])
+        if state.get("extracted_data") is not None:
+            # Data merged by saves after the original load, with the version the client holds
+            self.data_extractor.set_data(state["extracted_data"], version=state.get("version"))
+        if self._data_extractor is not None:
+            self._persisted_version = self._data_extractor.get_version()
+        if state.get("phase"):
+            self.current_phase = state["phase"]
+
+        self.state.message_count = len(self.transcript)
+        self.conversation_history.extend(
+            self.transcript.read_messages(max(0, len(self.transcript) - HISTORY_TAIL))
+        )
+
+    def _persist_extracted_data(self) -> None:
+        """Record the extracted data and its version in the transcript when it has changed."""
+        if self.transcript is None:
+            return
+        version = self.data_extractor.get_version()
+        if version == self._persisted_version:
+            return
+        self.transcript.append_state(
+            extracted_data=self.data_extractor.get_data(), version=version
+        )
+        self._persisted_version = version
+
+    def is_persisted(self) -> bool:
+        """
+        Check whether resuming from the transcript would restore this conversation.
+
+        Returns:
+            True if the conversation has a transcript holding its current extracted data
+        """
+        if self.transcript is None:
+            return False
+        if self._data_extractor is None:
+            return True
+        return self._data_extractor.matches_version(self._persisted_version)
+
+    def get_full_history(self) -> List[Dict[str, str]]:
+        """
+        Get every user and assistant message, reading older ones from the transcript.
+
+        Returns:
+            List of {"role", "content"} messages
+        """
+        if self.transcript is not None and len(self.transcript) > len(self.conversation_history):
+            return self.transcript.read_messages()
+        return list(self.conversation_history)
+
+    @property
+    def data_extractor(self) -> FamilyDataExtractor:
+        """The data extractor, created the first time it is needed."""
+        if self._data_extractor is None:
+            self._data_extractor = FamilyDataExtractor()
+        return self._data_extractor
+
+    @property
+    def current_phase(self) -> str:
+        """The current conversation phase."""
+        return self.state.phase
+
+    @current_phase.setter
+    def current_phase(self, phase: str) -> None:
+        self.state.set_phase(phase)
+
+    def _enhance_prompt_with_saved_data(self, base_prompt: str) -> str:
+        """
+        Enhance the system prompt with the most relevant previously saved conversation data.
+
+        Args:
+            base_prompt: The original system prompt
+
+        Returns:
+            Enhanced prompt with previously saved context
+        """
+        if not self.saved_data or not self.saved_data.get("extracted_data"):
+            return base_prompt
+
+        # Pick the most relevant facts that fit the context budget
+        if self._context_selector is None:
+            self._context_selector = FamilyContextSelector(self.saved_data["extracted_data"])
+        recent_turns = [
+            msg["content"] for msg in self.conversation_history if msg["role"] == "user"
+        ][-RECENT_TURNS_FOR_CONTEXT:]
+        structure = None
+        if self.current_phase == STRUCTURE_PHASE:
+            structure = self.data_extractor.get_structure_summary()
+        if structure:
+            # The summary takes part of the budget and covers some relationships and
+            # dynamics, so those rank lower but are still listed when they fit
+            context_sections = self._context_selector.select(
+                self.current_phase,
+                recent_turns,
+                token_budget=max(0, CONTEXT_TOKEN_BUDGET - estimate_tokens(structure)),
+                category_weights=STRUCTURE_CATEGORY_WEIGHTS,
+            )
+            context_sections.append(structure)
+        else:
+            context_sections = self._context_selector.select(self.current_phase, recent_turns)
+
+        # Combine all sections into a context block
+        if context_sections:
+            context_block = (
+                """
+        IMPORTANT: The user is returning to a previous conversation. Here is what we know about their family:
+        
+        """
+                + "\n\n".join(context_sections)
+                + """
+        
+        Based on this information, acknowledge their return and ask a relevant follow-up question about 
+        something specific from the information above. Do not overwhelm them with all these details at once.
+        Focus on one area they might want to explore further.
+        """
+            )
+            # Add the context block before the base prompt
+            enhanced_prompt = context_block + "\n\n" + base_prompt
+            return enhanced_prompt
+
+        return base_prompt
+
+    def _add_structure_summary(self, base_prompt: str) -> str:
+        """
+        Add the family structure derived from data extracted so far to the system prompt.
+
+        Args:
+            base_prompt: The original system prompt
+
+        Returns:
+            Prompt with the structure summary, or the base prompt if there is none
+        """
+        if self._data_extractor is None:
+            return base_prompt
+        structure = self._data_extractor.get_structure_summary()
+        if not structure:
+            return base_prompt
+        return (
+            """
+        Here is the family structure derived from what the user has shared so far. Use it to ground
+        your analysis, but confirm patterns with the user before drawing conclusions:
+
+        """
+            + structure
+            + "\n\n"
+            + base_prompt
+        )
+
+    def _refresh_base_prompt(self) -> None:
+        """Rebuild the base prompt with the family context that fits the current phase."""
+        base_prompt = self._get_system_prompt()
+        if self.saved_data:
+            base_prompt = self._enhance_prompt_with_saved_data(base_prompt)
+        elif self.current_phase == STRUCTURE_PHASE:
+            base_prompt = self._add_structure_summary(base_prompt)
+        self.state.set_base_prompt(base_prompt)
+
+    def load_saved_data(self, saved_data: Dict[str, Any]) -> None:
+        """
+        Load saved data from a previous conversation.
+
+        Args:
+            saved_data: Dictionary containing saved conversation data
+        """
+        logging.info("Loading saved data into conversation")
+        self.saved_data = saved_data
+
+        # Update current phase if available
+        if "phase" in saved_data:
+            self.current_phase = saved_data["phase"]
+            logging.info(f"Restored conversation phase: {self.current_phase}")
+
+        # If we have extracted data, update the data extractor
+        if "extracted_data" in saved_data:
+            extracted_data = saved_data["extracted_data"]
+            self.data_extractor.set_data(extracted_data, version=saved_data)
+            logging.info("Restored extracted family data")
+
+    def _get_system_prompt(self):
+        """Return the system prompt for Claude with guidance to reference psychological theories and books."""
+        return SYSTEM_PROMPT
+
+    def _add_message(self, role, content):
+        """Add a message to the conversation history and transcript."""
+        self.conversation_history.append({"role": role, "content": content})
+        if self.transcript is not None:
+            self.transcript.append_message(role, content)
+        self.state.record_message()
 
     def _add_user_message(self, content):
         """Add a user message to the conversation history."""
-        self.conversation_history.append({"role": "user", "content": content})
+        self._add_message("user", content)
 
     def _add_assistant_message(self, content):
         """Add an assistant message to the conversation history."""
-        self.conversation_history.append({"role": "assistant", "content": content})
+        self._add_message("assistant", content)
 
+    @traced("conversation.process_user_input")
     def process_user_input(self, user_input):
         """
         Process user input through Claude and get response.
@@ -282,16 +421,23 @@ class FamilyDynamicsConversation:
         Returns:
             str: Claude's response
         """
+        get_current_span().set_attributes(
+            {
+                "conversation.phase": self.current_phase,
+                "conversation.history_length": self.state.message_count,
+                "conversation.resident_messages": len(self.conversation_history),
+                "input.chars": len(user_input),
+            }
+        )
+
         # Special case for initialization
         if user_input == "__init__":
             # If we have saved data, create a personalized welcome back message
             if self.saved_data:
-                response = self._generate_welcome_back_message()
+                # Use the greeting precomputed at save time if it matches the data
+                response = self._precomputed_welcome_back() or self._generate_welcome_back_message()
             else:
-                response = (
-                    "Hello! I'm here to help you explore and understand your family dynamics. "
-                    "Let's start by learning about your family members. Could you tell me who makes up your immediate family?"
-                )
+                response = INITIAL_GREETING
 
             self._add_assistant_message(response)
             return response
@@ -310,11 +456,94 @@ class FamilyDynamicsConversation:
 
         return response
 
-    def _generate_welcome_back_message(self):
+    def _precomputed_welcome_back(self) -> Optional[str]:
+        """
+        Get the greeting shipped with the saved data if it was generated for exactly this data.
+
+        Returns:
+            The precomputed greeting, or None if it is missing or stale
+        """
+        welcome_back = self.saved_data.get("welcome_back")
+        if not isinstance(welcome_back, dict) or not isinstance(welcome_back.get("message"), str):
+            return None
+        if (
+            welcome_back.get("etag") == self.data_extractor.get_etag()
+            and welcome_back.get("phase") == self.current_phase
+        ):
+            logging.info("Using precomputed welcome back message")
+            return welcome_back["message"]
+        logging.info("Precomputed welcome back message is stale, regenerating")
+        return None
+
+    def precompute_welcome_back(self) -> None:
+        """
+        Start generating the greeting a restore of the current data would show,
+        in a background thread. Does nothing if one is already ready or running
+        for the same data and phase.
+        """
+        etag = self.data_extractor.get_etag()
+        key = (etag, self.current_phase)
+        future = self._welcome_back
+        if key == self._welcome_back_key and future is not None:
+            if not future.done() or future.result() is not None:
+                return
+
+        # Snapshot the data as it would be saved; the live data keeps changing
+        saved_data = {
+            "extracted_data": json.loads(json.dumps(self.data_extractor.family_data)),
+            "phase": self.current_phase,
+            **self.data_extractor.get_version(),
+        }
+        self._welcome_back_key = key
+        self._welcome_back = _get_welcome_back_executor().submit(
+            FamilyDynamicsConversation._render_welcome_back, saved_data
+        )
+
+    @staticmethod
+    def _render_welcome_back(saved_data: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Generate the greeting a conversation restored from saved_data would show."""
+        try:
+            restored = FamilyDynamicsConversation(saved_data=saved_data)
+            message = restored._generate_welcome_back_message(fallback=False)
+        except Exception as e:
+            logging.error(f"Error precomputing welcome message: {e}")
+            return None
+        if not message:
+            return None
+        return {"etag": saved_data["etag"], "phase": saved_data["phase"], "message": message}
+
+    def get_welcome_back(self, timeout: Optional[float] = 0) -> Optional[Dict[str, str]]:
+        """
+        Get the greeting precomputed for the current data.
+
+        Args:
+            timeout: Seconds to wait for it to finish; 0 returns immediately
+
+        Returns:
+            Dictionary with etag, phase and message, or None if it is not ready or stale
+        """
+        future = self._welcome_back
+        if future is None:
+            return None
+        try:
+            welcome_back = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+        if welcome_back and (welcome_back["etag"], welcome_back["phase"]) == (
+            self.data_extractor.get_etag(),
+            self.current_phase,
+        ):
+            return welcome_back
+        return None
+
+    def _generate_welcome_back_message(self, fallback: bool = True):
         """
         Let Claude generate a personalized welcome back message based on saved data.
         Uses the conversation context already loaded with family information.
 
+        Args:
+            fallback: Return a generic greeting instead of None if generation fails
+
         Returns:
             str: Welcome back message from Claude
         """
@@ -332,28 +561,11 @@ class FamilyDynamicsConversation:
                 ),
             }
 
-            # Extract system message and existing conversation context
-            system_content = None
-            api_messages = []
-
-            for msg in self.conversation_history:
-                if msg["role"] == "system":
-                    system_content = msg["content"]
-                    # We already have the system message with family context
-                    break
-
-            # Initialize Anthropic client
-            from anthropic import Anthropic
-
-            anthropic = Anthropic(api_key=self.api_key)
-
             # Call Claude for a welcome message
-            message = anthropic.messages.create(
-                model="claude-3-7-sonnet-20250219",
-                max_tokens=300,
-                system=system_content,  # System prompt already contains family context
+            message = get_router(self.api_key).create_message(
+                "welcome",
+                system=self.state.system_blocks,  # System prompt already contains family context
                 messages=[welcome_prompt],  # Just the welcome prompt
-                temperature=0.7,
             )
 
             # Extract and return the response text
@@ -361,34 +573,33 @@ class FamilyDynamicsConversation:
                 return message.content[0].text
             else:
                 # Fallback if something goes wrong
-                return "Welcome back to our conversation about your family dynamics! What would you like to explore today?"
+                return WELCOME_BACK_FALLBACK if fallback else None
 
         except Exception as e:
             logging.error(f"Error generating welcome message: {e}")
             # Fallback message if the API call fails
-            return "Welcome back to our conversation about your family dynamics! What would you like to explore today?"
+            return WELCOME_BACK_FALLBACK if fallback else None
 
+    @traced("conversation.update_phase")
     def _update_phase(self):
         """Update the conversation phase based on progress."""
-        # Count non-system messages
-        message_count = sum(
-            1 for msg in self.conversation_history if (msg["role"] != "system")
+        new_phase = self.state.advance()
+        get_current_span().set_attributes(
+            {
+                "conversation.phase": self.current_phase,
+                "conversation.history_length": self.state.message_count,
+                "conversation.phase_changed": bool(new_phase),
+            }
         )
-
-        # Simple phase transitions based on message count
-        if self.current_phase == "initial_data_collection" and message_count > 6:
-            self.current_phase = "deep_dive"
-            self._add_system_message(
-                "The user has provided basic family information. Now transition to exploring "
-                "deeper dynamics like communication patterns, decision-making, and conflicts."
-            )
-        elif self.current_phase == "deep_dive" and message_count > 14:
-            self.current_phase = "analysis"
-            self._add_system_message(
-                "Now provide insights about patterns you've observed in their family dynamics. "
-                "Offer thoughtful observations that might help them understand their family better."
-            )
-
+        if new_phase:
+            logging.info(f"Conversation moved to phase: {new_phase}")
+            if self.transcript is not None:
+                self.transcript.append_state(phase=new_phase)
+            # Re-rank the saved context for the new phase and recent turns
+            if self.saved_data or new_phase == STRUCTURE_PHASE:
+                self._refresh_base_prompt()
+
+    @traced("conversation.call_claude_api")
     def _call_claude_api(self):
         """
         Call the Claude API with the current conversation using the Anthropic client.
@@ -400,30 +611,19 @@ class FamilyDynamicsConversation:
             return "API key not configured. Please set the ANTHROPIC_API_KEY environment variable."
 
         try:
-            # Initialize Anthropic client
-            from anthropic import Anthropic
-
-            anthropic = Anthropic(api_key=self.api_key)
-
-            # Extract system message and user/assistant messages separately
-            system_content = None
-            api_messages = []
-
-            for msg in self.conversation_history:
-                if msg["role"] == "system":
-                    # Capture the latest system message
-                    system_content = msg["content"]
-                else:
-                    # Add user and assistant messages to the messages list
-                    api_messages.append(msg)
-
-            # Call the API using the client with proper formatting
-            message = anthropic.messages.create(
-                model="claude-3-7-sonnet-20250219",
-                max_tokens=1000,
-                system=system_content,  # System prompt as a separate parameter
-                messages=api_messages,  # Only user and assistant messages
-                temperature=0.7,
+            messages = self.get_full_history()
+            get_current_span().set_attributes(
+                {
+                    "conversation.history_length": len(messages),
+                    "prompt.system_chars": len(self.state.system_prompt),
+                }
+            )
+
+            # Call the API through the router with proper formatting
+            message = get_router(self.api_key).create_message(
+                "chat",
+                system=self.state.system_blocks,  # Base prompt plus phase overlay
+                messages=messages,  # Only user and assistant messages
             )
 
             # Extract and return the response text
@@ -439,33 +639,74 @@ class FamilyDynamicsConversation:
                 "Please check the API key configuration or try again later."
             )
 
-    def save_conversation(self, user_id: str) -> Dict[str, Any]:
+    def matches_client_version(self, version: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check whether the client already holds this conversation's data and phase.
+
+        Args:
+            version: Dictionary with lineage, revision, etag and phase as last seen by the client
+
+        Returns:
+            True if nothing changed since the client's version
+        """
+        return (
+            bool(version)
+            and version.get("phase") == self.current_phase
+            and self.data_extractor.matches_version(version)
+        )
+
+    def save_conversation(
+        self, user_id: str, client_version: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Extract data from the conversation and save it to storage.
         This is called explicitly when the user presses "Save Conversation".
 
         Args:
             user_id: Unique identifier for the user
+            client_version: Optional lineage, revision, etag and phase of the client's
+                saved copy, used to send only the changes since then
 
         Returns:
-            Dictionary with extraction results and save status
+            Dictionary with extraction results and save status. Contains
+            "unchanged": True when the client's copy is already current.
         """
         try:
             # Extract data from the full conversation
             extracted_data = self.data_extractor.extract_from_conversation(
-                self.conversation_history
+                self.get_full_history()
             )
+            extraction_status = "complete" if extracted_data else "no_data_found"
+
+            # Keep the derived structure in the prompt current during analysis
+            if extracted_data and self.current_phase == STRUCTURE_PHASE:
+                self._refresh_base_prompt()
+
+            # Prepare the greeting a later restore of this data will show
+            self.precompute_welcome_back()
+            self._persist_extracted_data()
+
+            if self.matches_client_version(client_version):
+                return {
+                    "unchanged": True,
+                    "version": self.data_extractor.get_version(),
+                    "extraction_status": extraction_status,
+                }
 
-            # Prepare the data to save
+            # Prepare the data to save, sending only what the client is missing
             data = {
-                "extracted_data": extracted_data,
+                "delta": self.data_extractor.get_delta(client_version),
                 "phase": self.current_phase,
                 "last_updated": datetime.now().isoformat(),
+                **self.data_extractor.get_version(),
             }
+            welcome_back = self.get_welcome_back()
+            if welcome_back:
+                data["welcome_back"] = welcome_back
 
             return {
                 "data": data,
-                "extraction_status": "complete" if extracted_data else "no_data_found",
+                "extraction_status": extraction_status,
             }
 
         except Exception as e:
@@ -0,0 +1,135 @@
+# modules/conversation_state.py
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+INITIAL_PHASE = "initial_data_collection"
+
+# Guidance appended to the base system prompt while a phase is active
+PHASE_OVERLAYS = {
+    "initial_data_collection": None,
+    "deep_dive": (
+        "The user has provided basic family information. Now transition to exploring "
+        "deeper dynamics like communication patterns, decision-making, and conflicts."
+    ),
+    "analysis": (
+        "Now provide insights about patterns you've observed in their family dynamics. "
+        "Offer thoughtful observations that might help them understand their family better."
+    ),
+}
+
+# Phase transitions: move to next_phase once more than max_messages
+# user/assistant messages have been exchanged
+PHASE_TRANSITIONS = {
+    "initial_data_collection": {"next_phase": "deep_dive", "max_messages": 6},
+    "deep_dive": {"next_phase": "analysis", "max_messages": 14},
+}
+
+
+@lru_cache(maxsize=64)
+def compose_system_prompt(base_prompt: str, phase: str) -> str:
+    """
+    Compose the system prompt for a phase. Cached so conversations sharing
+    a base prompt also share the composed prompt.
+
+    Args:
+        base_prompt: The base system prompt
+        phase: The current phase
+
+    Returns:
+        The base prompt followed by the phase overlay, if any
+    """
+    overlay = PHASE_OVERLAYS.get(phase)
+    if overlay:
+        return base_prompt + "\n\n" + overlay
+    return base_prompt
+
+
+@lru_cache(maxsize=64)
+def compose_system_blocks(base_prompt: str, phase: str) -> List[Dict[str, Any]]:
+    """
+    Compose the system prompt as API content blocks, marked for provider-side
+    prompt caching. The returned list is shared and must not be modified.
+
+    Args:
+        base_prompt: The base system prompt
+        phase: The current phase
+
+    Returns:
+        A single cacheable text block
+    """
+    return [
+        {
+            "type": "text",
+            "text": compose_system_prompt(base_prompt, phase),
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+class ConversationState:
+    """
+    Tracks the conversation phase with running counters.
+    Composes the system prompt from the base prompt and the active phase overlay,
+    rebuilding it only when the phase or base prompt changes.
+    """
+
+    def __init__(self, base_prompt: str, phase: str = INITIAL_PHASE, message_count: int = 0):
+        """
+        Initialize the conversation state.
+
+        Args:
+            base_prompt: The base system prompt
+            phase: Starting phase
+            message_count: Number of user/assistant messages already exchanged
+        """
+        self.base_prompt = base_prompt
+        self.phase = phase
+        self.message_count = message_count
+
+    def record_message(self) -> None:
+        """Count a user or assistant message."""
+        self.message_count += 1
+
+    def advance(self) -> Optional[str]:
+        """
+        Apply the transition rule for the current phase.
+
+        Returns:
+            The new phase if a transition happened, otherwise None
+        """
+        rule = PHASE_TRANSITIONS.get(self.phase)
+        if rule and self.message_count > rule["max_messages"]:
+            self.set_phase(rule["next_phase"])
+            return self.phase
+        return None
+
+    def set_phase(self, phase: str) -> None:
+        """
+        Set the current phase.
+
+        Args:
+            phase: The new phase
+        """
+        self.phase = phase
+
+    def set_base_prompt(self, base_prompt: str) -> None:
+        """
+        Replace the base system prompt.
+
+        Args:
+            base_prompt: The new base system prompt
+        """
+        self.base_prompt = base_prompt
+
+    @property
+    def system_prompt(self) -> str:
+        """The base prompt followed by the overlay of the current phase."""
+        return compose_system_prompt(self.base_prompt, self.phase)
+
+    @property
+    def system_blocks(self) -> List[Dict[str, Any]]:
+        """
+        The system prompt as API content blocks, marked for provider-side prompt caching.
+        The blocks stay identical between transitions so the cached prefix can be reused.
+        """
+        return compose_system_blocks(self.base_prompt, self.phase)
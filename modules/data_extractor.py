@@ -1,8 +1,17 @@
 # modules/data_extractor.py
 import logging
 import json
-from typing import Dict, Any
+import hashlib
+import uuid
+from typing import Dict, Any, List, Optional
 import os
+from modules.model_router import get_router
+from modules.tracing import traced, get_current_span
+from modules.dedup import NearDuplicateIndex, TEXT_FIELDS
+from modules.genogram import GenogramAnalyzer, format_summary
+
+# Number of recent revisions whose etags are remembered for delta sync
+TRACKED_REVISIONS = 32
 
 class FamilyDataExtractor:
     """
@@ -19,6 +28,16 @@ class FamilyDataExtractor:
             "dynamics": [],  # Patterns of interaction
             "events": [],  # Significant family events
         }
+        # Versioning for delta sync: a lineage id for this data set, a monotonic
+        # revision, and the revision at which each item last changed
+        self.lineage = uuid.uuid4().hex
+        self.revision = 0
+        self._item_revisions = {category: [] for category in self.family_data}
+        self._etag = None
+        self._near_duplicates = None
+        self._genogram = None
+        self._etag_revision = None
+        self._revision_etags = {}  # Revision -> etag of the data at that revision
         self.api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError(
@@ -55,6 +74,7 @@ class FamilyDataExtractor:
             logging.error(f"Error extracting family data: {e}")
             return {}
 
+    @traced("extractor.create_extraction_prompt")
     def _create_extraction_prompt(self, conversation_history: str) -> str:
         """
         Create a prompt specialized for information extraction.
@@ -73,6 +93,8 @@ class FamilyDataExtractor:
             elif msg["role"] == "assistant":
                 formatted_conversation += f"ASSISTANT: {msg['content']}\n\n"
 
+        get_current_span().set_attribute("conversation.history_length", len(conversation_history))
+
         return f"""
         Extract structured information about family relationships from this message. 
         Focus ONLY on concrete facts, not interpretations or assumptions.
@@ -107,6 +129,7 @@ class FamilyDataExtractor:
         RESPONSE (JSON ONLY):
         """
 
+    @traced("extractor.call_claude_api")
     def _call_claude_api(self, extraction_prompt) -> Dict[str, Any]:
         """
         Extract family information from a user message using Claude.
@@ -125,20 +148,14 @@ class FamilyDataExtractor:
                 )
                 return {}
 
-            # Initialize Anthropic client
-            from anthropic import Anthropic
-            anthropic = Anthropic(api_key=self.api_key)
-
             # Format messages for Claude
             messages = [{"role": "user", "content": extraction_prompt}]
 
-            # Call the API using the client with proper formatting
-            response = anthropic.messages.create(
-                model="claude-3-7-sonnet-20250219",
-                max_tokens=1000,
+            # Call the API through the router with proper formatting
+            response = get_router(self.api_key).create_message(
+                "extraction",
                 system=extraction_prompt,
                 messages=messages,
-                temperature=0.2,  # Lower temperature for more consistent extraction
             )
 
             # Extract the response text
@@ -152,6 +169,7 @@ class FamilyDataExtractor:
             logging.error(f"Error extracting family data: {e}")
             return {}
 
+    @traced("extractor.parse_extraction_response")
     def _parse_extraction_response(self, response: str) -> Dict[str, Any]:
         """
         Parse the LLM's extraction response into structured data.
@@ -185,6 +203,12 @@ class FamilyDataExtractor:
                     if key in data and isinstance(data[key], list):
                         valid_data[key] = data[key]
 
+                get_current_span().set_attributes(
+                    {
+                        "response.chars": len(response),
+                        "extraction.items": sum(len(items) for items in valid_data.values()),
+                    }
+                )
                 return valid_data
 
             return {}
@@ -196,14 +220,19 @@ class FamilyDataExtractor:
             logging.error(f"Error parsing extraction: {e}")
             return {}
 
+    @traced("extractor.update_family_data")
     def _update_family_data(self, new_data: Dict[str, Any]) -> None:
         """
         Update the internal family data with new information.
         Merges new data with existing data, avoiding duplicates.
+        Bumps the revision once if anything changed.
 
         Args:
             new_data: Newly extracted family information
         """
+        next_revision = self.revision + 1
+        changed = False
+
         # For each category of data
         for category in self.family_data:
             if category in new_data:
@@ -211,20 +240,97 @@ class FamilyDataExtractor:
                 for new_item in new_data[category]:
                     # For family members, check if we already have this person
                     if category == "family_members":
-                        self._merge_family_member(new_item)
+                        index = self._merge_family_member(new_item)
+                    # For dynamics and events, merge into a near duplicate if there is one
+                    elif category in TEXT_FIELDS and isinstance(new_item, dict):
+                        index = self._merge_near_duplicate(category, new_item)
                     # For other categories, avoid exact duplicates
                     else:
+                        index = None
                         if new_item not in self.family_data[category]:
                             self.family_data[category].append(new_item)
+                            index = len(self.family_data[category]) - 1
+
+                    if index is not None:
+                        self._mark_changed(category, index, next_revision)
+                        changed = True
+
+        if changed:
+            self.revision = next_revision
+
+        get_current_span().set_attributes(
+            {"family_data.changed": changed, "family_data.revision": self.revision}
+        )
+
+    def _get_near_duplicates(self) -> NearDuplicateIndex:
+        """Get the near-duplicate index, building it from the current data if needed."""
+        if self._near_duplicates is None:
+            self._near_duplicates = NearDuplicateIndex()
+            for category in TEXT_FIELDS:
+                for index, item in enumerate(self.family_data[category]):
+                    if isinstance(item, dict):
+                        self._near_duplicates.add(category, index, item)
+        return self._near_duplicates
+
+    def _merge_near_duplicate(self, category: str, new_item: Dict[str, Any]) -> Optional[int]:
+        """
+        Add a dynamic or event, or fold it into an existing near-duplicate item.
 
+        Args:
+            category: "dynamics" or "events"
+            new_item: Newly extracted item
 
-    def _merge_family_member(self, new_member: Dict[str, Any]) -> None:
+        Returns:
+            Index of the added or modified item, or None if nothing changed
+        """
+        near_duplicates = self._get_near_duplicates()
+        items = self.family_data[category]
+
+        # Items without usable text can only be exact duplicates
+        if not near_duplicates.indexable(category, new_item):
+            if new_item in items:
+                return None
+            items.append(new_item)
+            return len(items) - 1
+
+        match = near_duplicates.find(category, new_item)
+        if match is None:
+            items.append(new_item)
+            near_duplicates.add(category, len(items) - 1, new_item)
+            return len(items) - 1
+
+        # Keep the existing wording, but take any new members or fields
+        existing = items[match]
+        changed = False
+        for key, value in new_item.items():
+            if key not in existing:
+                existing[key] = value
+                changed = True
+            elif key == "members" and isinstance(value, list) and isinstance(existing[key], list):
+                new_members = [m for m in value if m not in existing[key]]
+                if new_members:
+                    existing[key] = existing[key] + new_members
+                    changed = True
+        return match if changed else None
+
+    def _mark_changed(self, category: str, index: int, revision: int) -> None:
+        """Record the revision at which an item was added or modified."""
+        item_revisions = self._item_revisions[category]
+        if index < len(item_revisions):
+            item_revisions[index] = revision
+        else:
+            item_revisions.append(revision)
+
+    def _merge_family_member(self, new_member: Dict[str, Any]) -> Optional[int]:
         """
         Merge a newly extracted family member with existing records.
         Updates existing records with new attributes if the member already exists.
 
         Args:
             new_member: Newly extracted family member data
+
+        Returns:
+            Index of the added or modified member, or None if nothing changed
         """
         # Try to find matching member by name first
         if "name" in new_member and new_member["name"]:
@@ -232,17 +338,7 @@ class FamilyDataExtractor:
             for i, member in enumerate(self.family_data["family_members"]):
                 if member.get("name", "") == name:
                     # Merge attributes, but don't overwrite existing ones
-                    for key, value in new_member.items():
-                        if key not in member:
-                            self.family_data["family_members"][i][key] = value
-                        elif key == "attributes" and isinstance(value, list):
-                            # For attributes, merge the lists without duplicates
-                            current_attrs = set(member.get("attributes", []))
-                            new_attrs = set(value)
-                            self.family_data["family_members"][i]["attributes"] = list(
-                                current_attrs | new_attrs
-                            )
-                    return
+                    return i if self._merge_member_fields(member, new_member) else None
 
         # If no match by name, try to match by role
         if "role" in new_member and new_member["role"]:
@@ -250,19 +346,36 @@ class FamilyDataExtractor:
             for i, member in enumerate(self.family_data["family_members"]):
                 if member.get("role", "") == role and "name" not in member:
                     # Found a match by role, merge the records
-                    for key, value in new_member.items():
-                        if key not in member:
-                            self.family_data["family_members"][i][key] = value
-                        elif key == "attributes" and isinstance(value, list):
-                            current_attrs = set(member.get("attributes", []))
-                            new_attrs = set(value)
-                            self.family_data["family_members"][i]["attributes"] = list(
-                                current_attrs | new_attrs
-                            )
-                    return
+                    return i if self._merge_member_fields(member, new_member) else None
 
         # If no match found, add as a new member
         self.family_data["family_members"].append(new_member)
+        return len(self.family_data["family_members"]) - 1
+
+    def _merge_member_fields(self, member: Dict[str, Any], new_member: Dict[str, Any]) -> bool:
+        """
+        Copy new fields into an existing member record without overwriting existing ones.
+
+        Args:
+            member: Existing family member record, updated in place
+            new_member: Newly extracted family member data
+
+        Returns:
+            True if the existing record changed
+        """
+        changed = False
+        for key, value in new_member.items():
+            if key not in member:
+                member[key] = value
+                changed = True
+            elif key == "attributes" and isinstance(value, list):
+                # For attributes, merge the lists without duplicates
+                current_attrs = set(member.get("attributes", []))
+                new_attrs = set(value)
+                if not new_attrs <= current_attrs:
+                    member["attributes"] = list(current_attrs | new_attrs)
+                    changed = True
+        return changed
 
     def get_data(self) -> Dict[str, Any]:
         """
@@ -273,12 +386,137 @@ class FamilyDataExtractor:
         """
         return self.family_data
 
-    def set_data(self, data: Dict[str, Any]) -> None:
+    def get_structure(self) -> Dict[str, Any]:
+        """
+        Get structural metrics (triangles, cutoffs, coalitions, sibling positions
+        and subsystem boundaries) for the current data, cached per revision.
+
+        Returns:
+            Dictionary of metrics from GenogramAnalyzer.summary
+        """
+        if self._genogram is None:
+            self._genogram = GenogramAnalyzer()
+        return self._genogram.summary(self)
+
+    def get_structure_summary(self) -> Optional[str]:
+        """
+        Get the structural metrics as a compact prompt section.
+
+        Returns:
+            A "FAMILY STRUCTURE:" section, or None if no structure was found
+        """
+        return format_summary(self.get_structure())
+
+    def get_etag(self) -> str:
+        """
+        Get a content hash of the current family data, cached per revision.
+
+        Returns:
+            Hex digest identifying the data contents
+        """
+        if self._etag is None or self._etag_revision != self.revision:
+            self._etag = self._compute_etag()
+            self._etag_revision = self.revision
+            # Remember which data each revision had, so deltas can be checked against it
+            self._revision_etags[self.revision] = self._etag
+            if len(self._revision_etags) > TRACKED_REVISIONS:
+                del self._revision_etags[next(iter(self._revision_etags))]
+        return self._etag
+
+    def _compute_etag(self) -> str:
+        """Hash the canonical JSON of the current family data."""
+        canonical = json.dumps(self.family_data, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+    def get_version(self) -> Dict[str, Any]:
+        """
+        Get the version of the current family data.
+
+        Returns:
+            Dictionary with lineage, revision and etag
+        """
+        return {"lineage": self.lineage, "revision": self.revision, "etag": self.get_etag()}
+
+    def matches_version(self, version: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check whether a client-side version refers to exactly the current data.
+
+        Args:
+            version: Dictionary with lineage, revision and etag as last seen by the client
+
+        Returns:
+            True if the client already has the current data
+        """
+        if not version:
+            return False
+        return (
+            version.get("lineage") == self.lineage
+            and version.get("revision") == self.revision
+            and version.get("etag") == self.get_etag()
+        )
+
+    def get_changes_since(self, revision: int) -> Dict[str, List[List[Any]]]:
+        """
+        Get the items added or modified after a revision.
+
+        Args:
+            revision: The last revision known to the client
+
+        Returns:
+            Dictionary mapping each changed category to a list of [index, item] pairs
+        """
+        changes = {}
+        for category, item_revisions in self._item_revisions.items():
+            items = self.family_data[category]
+            changed = [
+                [index, items[index]]
+                for index, item_revision in enumerate(item_revisions)
+                if item_revision > revision
+            ]
+            if changed:
+                changes[category] = changed
+        return changes
+
+    def get_delta(self, version: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build the payload that brings a client from its version to the current data.
+        Falls back to a full snapshot when the client's version is unknown or its
+        etag does not match the data this extractor had at that revision.
+
+        Args:
+            version: Dictionary with lineage, revision and etag as last seen by the client
+
+        Returns:
+            Either {"full": True, "extracted_data": ...} or
+            {"full": False, "base_revision": ..., "changes": ...}
+        """
+        self.get_etag()
+        base_revision = version.get("revision") if version else None
+        if (
+            version
+            and version.get("lineage") == self.lineage
+            and isinstance(base_revision, int)
+            and 0 <= base_revision <= self.revision
+            and version.get("etag") is not None
+            and version.get("etag") == self._revision_etags.get(base_revision)
+        ):
+            return {
+                "full": False,
+                "base_revision": base_revision,
+                "changes": self.get_changes_since(base_revision),
+            }
+
+        return {"full": True, "extracted_data": self.family_data}
+
+    def set_data(self, data: Dict[str, Any], version: Optional[Dict[str, Any]] = None) -> None:
         """
         Set the family data from an external source.
 
         Args:
             data: Family data to set
+            version: Optional lineage, revision and etag the data was saved with, so
+                later deltas can be computed relative to the client's copy. It is only
+                adopted if the etag matches the data.
         """
         # Validate the data structure
         valid_data = {
@@ -294,6 +532,29 @@ class FamilyDataExtractor:
                 valid_data[key] = data[key]
 
         self.family_data = valid_data
+        self._revision_etags = {}
+
+        # Adopt the client's version if it describes exactly this data, otherwise start a new lineage
+        revision = version.get("revision") if version else None
+        if (
+            version
+            and version.get("lineage")
+            and isinstance(revision, int)
+            and revision >= 0
+            and version.get("etag") == self._compute_etag()
+        ):
+            self.lineage = version["lineage"]
+            self.revision = revision
+        else:
+            self.lineage = uuid.uuid4().hex
+            self.revision = 0
+        self._item_revisions = {
+            category: [self.revision] * len(items)
+            for category, items in self.family_data.items()
+        }
+        self._etag = None
+        self._near_duplicates = None
+        self._genogram = None
 
     def clear_data(self) -> None:
         """Clear all family data."""
@@ -303,3 +564,10 @@ class FamilyDataExtractor:
             "dynamics": [],
             "events": [],
         }
+        self.lineage = uuid.uuid4().hex
+        self.revision = 0
+        self._item_revisions = {category: [] for category in self.family_data}
+        self._etag = None
+        self._revision_etags = {}
+        self._near_duplicates = None
+        self._genogram = None
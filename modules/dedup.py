@@ -0,0 +1,230 @@
+# modules/dedup.py
+import os
+import re
+import zlib
+from typing import Dict, Any, List, Optional, FrozenSet
+
+# Minimum Jaccard similarity of shingles for two items to be merged
+SIMILARITY_THRESHOLD = float(os.environ.get("FDA_DEDUP_THRESHOLD", 0.6))
+
+# Ordered word pairs up to this many words apart are added to the shingles
+PAIR_WINDOW = 3
+
+# MinHash signature layout: BANDS * ROWS hash functions
+BANDS = 16
+ROWS = 2
+
+# Text field compared for each category
+TEXT_FIELDS = {"dynamics": "pattern", "events": "description"}
+
+# Informal kinship terms and common synonyms mapped to one canonical word
+ALIASES = {
+    "dad": "father", "daddy": "father", "papa": "father", "pa": "father",
+    "mom": "mother", "mum": "mother", "mommy": "mother", "mama": "mother", "ma": "mother",
+    "grandma": "grandmother", "granny": "grandmother", "nana": "grandmother",
+    "grandpa": "grandfather", "granddad": "grandfather",
+    "bro": "brother", "sis": "sister", "siblings": "sibling",
+    "parents": "parent", "kids": "child", "kid": "child", "children": "child",
+    "silent": "quiet", "withdrawn": "quiet",
+    "argue": "conflict", "argument": "conflict", "arguments": "conflict",
+    "fight": "conflict", "fights": "conflict", "quarrel": "conflict",
+    "dinners": "dinner", "meals": "meal",
+}
+
+# Multi-word phrases rewritten before tokenizing
+PHRASE_ALIASES = {
+    "rarely speaks": "quiet",
+    "rarely talks": "quiet",
+    "never speaks": "quiet",
+    "never talks": "quiet",
+    "doesn't talk": "quiet",
+    "does not talk": "quiet",
+    "shuts down": "quiet",
+}
+
+# Words that negate a pattern; items only merge with items of the same polarity
+NEGATIONS = {"not", "no", "never", "nobody", "nothing", "none", "neither", "nor"}
+NEGATION_TOKEN = "not"
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "at", "in", "on",
+    "of", "to", "and", "or", "for", "with", "during", "about", "by", "his", "her",
+    "their", "they", "he", "she", "it", "its", "that", "this", "very", "often",
+    "usually", "always", "tends", "tend", "has", "have", "had", "get", "gets",
+    "got",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MASK = (1 << 32) - 1
+_SEEDS = [(0x9E3779B1 * (i + 1)) & _MASK for i in range(BANDS * ROWS)]
+
+
+def _stem(word: str) -> str:
+    """Strip common English suffixes so word forms compare equal."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def normalize_words(text: str) -> List[str]:
+    """
+    Reduce text to its canonical words, in order.
+
+    Args:
+        text: Free-text pattern or description
+
+    Returns:
+        Lowercased, alias-mapped, stemmed words without stopwords. Numbers are
+        kept and negations become a single NEGATION_TOKEN.
+    """
+    text = text.lower().replace("\u2019", "'")
+    for phrase, replacement in PHRASE_ALIASES.items():
+        if phrase in text:
+            text = text.replace(phrase, replacement)
+    text = text.replace("n't", " not")
+
+    words = []
+    for word in _WORD_RE.findall(text):
+        if word in NEGATIONS:
+            words.append(NEGATION_TOKEN)
+        elif word not in STOPWORDS:
+            words.append(_stem(ALIASES.get(word, word)))
+    return words
+
+
+def normalize_tokens(text: str) -> FrozenSet[str]:
+    """
+    Reduce text to a set of shingles: its canonical words plus ordered pairs of
+    words up to PAIR_WINDOW apart. "father yells at son" and "son yells at
+    father" share every word but no pair, while an extra filler word only
+    adds a few pairs.
+
+    Args:
+        text: Free-text pattern or description
+
+    Returns:
+        Set of word and "word word" shingles
+    """
+    words = normalize_words(text)
+    shingles = set(words)
+    for i, first in enumerate(words):
+        for second in words[i + 1 : i + 1 + PAIR_WINDOW]:
+            shingles.add(f"{first} {second}")
+    return frozenset(shingles)
+
+
+def numbers(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    """Numeric tokens such as years and ages; items with different numbers never merge."""
+    return frozenset(token for token in tokens if token.isdigit())
+
+
+def minhash(tokens: FrozenSet[str]) -> List[int]:
+    """
+    Compute a MinHash signature with stable (process-independent) hashing.
+
+    Args:
+        tokens: Normalized tokens
+
+    Returns:
+        BANDS * ROWS minimum hash values
+    """
+    hashes = [zlib.crc32(token.encode("utf-8")) for token in tokens]
+    return [min((h ^ seed) * 0x01000193 & _MASK for h in hashes) for seed in _SEEDS]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two token sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """
+    Locality-sensitive hashing index over dynamics and events.
+    Candidates come from matching MinHash bands, so each lookup only compares
+    against a handful of items instead of the whole list.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        """
+        Initialize an empty index.
+
+        Args:
+            threshold: Minimum Jaccard similarity for a near duplicate
+        """
+        self.threshold = threshold
+        self._buckets = {}  # (category, band, band values) -> item indexes
+        self._tokens = {}  # (category, index) -> (shingles, item type)
+
+    def indexable(self, category: str, item: Dict[str, Any]) -> bool:
+        """Whether an item has enough text to be compared by similarity."""
+        return self._signature(category, item) is not None
+
+    def _signature(self, category: str, item: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+        """Normalized tokens of an item's text, or None if it has no text."""
+        text = item.get(TEXT_FIELDS[category])
+        if not isinstance(text, str) or not text.strip():
+            return None
+        tokens = normalize_tokens(text)
+        if not tokens:
+            return None
+        return tokens
+
+    def _band_keys(self, category: str, tokens: FrozenSet[str]):
+        signature = minhash(tokens)
+        for band in range(BANDS):
+            yield (category, band, tuple(signature[band * ROWS : (band + 1) * ROWS]))
+
+    def find(self, category: str, item: Dict[str, Any]) -> Optional[int]:
+        """
+        Find an existing item that is a near duplicate of the given one.
+
+        Args:
+            category: "dynamics" or "events"
+            item: The new item
+
+        Returns:
+            Index of the most similar existing item of the same type, negation
+            and numbers, or None
+        """
+        tokens = self._signature(category, item)
+        if tokens is None:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(category, tokens):
+            candidates.update(self._buckets.get(key, ()))
+
+        negated = NEGATION_TOKEN in tokens
+        item_numbers = numbers(tokens)
+        best_index, best_score = None, self.threshold
+        for index in candidates:
+            existing_tokens, existing_type = self._tokens[(category, index)]
+            if (
+                existing_type != item.get("type")
+                or (NEGATION_TOKEN in existing_tokens) != negated
+                or numbers(existing_tokens) != item_numbers
+            ):
+                continue
+            score = jaccard(tokens, existing_tokens)
+            if score >= best_score:
+                best_index, best_score = index, score
+        return best_index
+
+    def add(self, category: str, index: int, item: Dict[str, Any]) -> None:
+        """
+        Index an item stored at the given position of its category list.
+
+        Args:
+            category: "dynamics" or "events"
+            index: Position of the item in family_data[category]
+            item: The item
+        """
+        tokens = self._signature(category, item)
+        if tokens is None:
+            return
+        self._tokens[(category, index)] = (tokens, item.get("type"))
+        for key in self._band_keys(category, tokens):
+            self._buckets.setdefault(key, []).append(index)
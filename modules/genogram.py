@@ -0,0 +1,431 @@
+# modules/genogram.py
+import re
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Any, List, Optional
+
+# Maximum entries listed per metric in the text summary
+MAX_SUMMARY_ITEMS = 5
+
+# Role keywords mapped to a generation (0 = grandparents, 1 = parents, 2 = children,
+# 3 = grandchildren). Checked in order, so compound roles come before the words they
+# contain and grandchildren (including great-grandchildren) before "great" and "grand".
+ROLE_GENERATIONS = [
+    ("grandson", 3), ("granddaughter", 3), ("grandchild", 3), ("grandkid", 3),
+    ("great", 0),
+    ("grand", 0),
+    ("mother", 1), ("father", 1), ("parent", 1), ("mom", 1), ("dad", 1),
+    ("aunt", 1), ("uncle", 1),
+    ("son", 2), ("daughter", 2), ("brother", 2), ("sister", 2), ("sibling", 2),
+    ("child", 2), ("twin", 2), ("cousin", 2), ("user", 2), ("self", 2), ("me", 2),
+]
+
+# Roles that make someone part of the sibling subsystem
+SIBLING_ROLES = ("son", "daughter", "brother", "sister", "sibling", "child", "twin", "user", "self", "me")
+
+SUBSYSTEM_NAMES = {0: "grandparents", 1: "parents", 2: "children", 3: "grandchildren"}
+
+# Emotional tie keywords, matched against relationship type/quality and dynamic/event text
+TIE_KEYWORDS = {
+    "cutoff": ("cut off", "cutoff", "cut-off", "estrang", "no contact", "stopped speaking",
+               "not speaking", "don't speak", "doesn't speak", "disown"),
+    "conflict": ("conflict", "tense", "tension", "argu", "fight", "hostil", "resent",
+                 "clash", "quarrel", "strained"),
+    "distant": ("distant", "cold", "detached", "avoid", "not close", "withdrawn"),
+    "alliance": ("side with", "sides with", "siding", "alliance", "coalition", "team up",
+                 "teams up", "favorite", "favourite", "confidant"),
+    "enmeshed": ("enmesh", "fused", "inseparable", "parentif", "overinvolved", "over-involved"),
+    "close": ("close", "warm", "supportive", "best friend", "bond"),
+}
+
+# Structural ties, matched against the relationship type
+STRUCTURAL_KEYWORDS = {
+    "spouse": ("marri", "spouse", "husband", "wife", "partner", "divorc"),
+    "parent": ("parent", "mother-", "father-", "-son", "-daughter", "child"),
+    "sibling": ("sibling", "brother", "sister", "twin"),
+}
+
+# Dynamics that name a triangle directly
+TRIANGLE_KEYWORDS = ("triang", "go-between", "messenger", "caught between", "in the middle")
+
+NEGATIVE_TIES = ("conflict", "distant", "cutoff")
+POSITIVE_TIES = ("close", "enmeshed", "alliance")
+
+_ORDINAL_RE = re.compile(r"\b(oldest|eldest|first-born|firstborn|middle|youngest|baby of the family)\b")
+
+
+def _matches(text: str, keywords) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+
+def role_generation(role: Optional[str]) -> Optional[int]:
+    """
+    Infer a generation from a role description.
+
+    Args:
+        role: Role such as "father" or "older sister"
+
+    Returns:
+        0 for grandparents, 1 for parents, 2 for children, 3 for grandchildren, or None
+    """
+    if not isinstance(role, str):
+        return None
+    role = role.lower()
+    words = set(re.findall(r"[a-z]+", role))
+    for keyword, generation in ROLE_GENERATIONS:
+        if (keyword in words) if len(keyword) <= 3 else (keyword in role):
+            return generation
+    return None
+
+
+def classify_ties(text: str) -> List[str]:
+    """
+    Classify the emotional quality of a relationship or dynamic.
+
+    Args:
+        text: Lowercased type, quality, pattern or description
+
+    Returns:
+        Tie kinds found in the text (a cutoff overrides everything else)
+    """
+    kinds = [kind for kind, keywords in TIE_KEYWORDS.items() if _matches(text, keywords)]
+    if "cutoff" in kinds:
+        return ["cutoff"]
+    if "distant" in kinds and "not close" in text and "close" in kinds:
+        kinds.remove("close")
+    return kinds
+
+
+class GenogramAnalyzer:
+    """
+    Derives family-systems structure from extracted family data: triangles,
+    cutoffs, coalitions, sibling positions and subsystem boundaries.
+
+    Ties are kept per source item, so after a merge only the items that changed
+    since the last update are re-read. Metrics are recomputed from the tie graph
+    and cached until the data revision changes.
+    """
+
+    def __init__(self):
+        """Initialize an empty analyzer."""
+        self.revision = None  # Data revision the ties reflect
+        self._people = {}  # Person key -> {"label", "role", "generation", "age", "text"}
+        self._aliases = {}  # Lowercased name or role -> person key
+        self._item_ties = {}  # (category, index) -> list of (a, b, kind)
+        self._ties = Counter()  # (a, b, kind) -> number of items supporting it
+        self._triangle_hints = {}  # (category, index) -> people named in a triangle dynamic
+        self._summary = None
+        self._summary_revision = None
+
+    def update(self, extractor) -> None:
+        """
+        Bring the ties up to date with a FamilyDataExtractor.
+
+        Args:
+            extractor: The data extractor whose family_data is analyzed
+        """
+        if self.revision == extractor.revision:
+            return
+        if self.revision is None or self.revision > extractor.revision:
+            self._rebuild(extractor.family_data)
+        else:
+            changes = extractor.get_changes_since(self.revision)
+            # Member changes can alter how every reference resolves
+            if "family_members" in changes:
+                self._rebuild(extractor.family_data)
+            else:
+                for category, changed in changes.items():
+                    for index, item in changed:
+                        self._apply_item(category, index, item)
+        self.revision = extractor.revision
+
+    def _rebuild(self, family_data: Dict[str, Any]) -> None:
+        """Re-read every item."""
+        self._people = {}
+        self._aliases = {}
+        self._item_ties = {}
+        self._ties = Counter()
+        self._triangle_hints = {}
+
+        for index, member in enumerate(family_data.get("family_members", [])):
+            if isinstance(member, dict):
+                self._add_member(index, member)
+        for category in ("relationships", "dynamics", "events"):
+            for index, item in enumerate(family_data.get(category, [])):
+                self._apply_item(category, index, item)
+
+    def _add_member(self, index: int, member: Dict[str, Any]) -> None:
+        key = f"member:{index}"
+        name = member.get("name") if isinstance(member.get("name"), str) else None
+        role = member.get("role") if isinstance(member.get("role"), str) else None
+        attributes = member.get("attributes") if isinstance(member.get("attributes"), list) else []
+
+        if name and role:
+            label = f"{name} ({role})"
+        else:
+            label = name or role or key
+        self._people[key] = {
+            "label": label,
+            "role": role,
+            "generation": role_generation(role),
+            "age": member.get("age") if isinstance(member.get("age"), (int, float)) else None,
+            "text": " ".join([role or ""] + [a for a in attributes if isinstance(a, str)]).lower(),
+        }
+        for alias in (name, role):
+            if alias and alias.strip():
+                self._aliases.setdefault(alias.strip().lower(), key)
+
+    def _resolve(self, reference: Any) -> Optional[str]:
+        """Map a name or role mentioned in an item to a person key, adding unknown people."""
+        if not isinstance(reference, str) or not reference.strip():
+            return None
+        alias = reference.strip().lower()
+        key = self._aliases.get(alias)
+        if key is None:
+            key = f"ref:{alias}"
+            self._aliases[alias] = key
+            self._people[key] = {
+                "label": reference.strip(),
+                "role": alias,
+                "generation": role_generation(alias),
+                "age": None,
+                "text": alias,
+            }
+        return key
+
+    def _apply_item(self, category: str, index: int, item: Any) -> None:
+        """Replace the ties contributed by one relationship, dynamic or event."""
+        for tie in self._item_ties.pop((category, index), ()):
+            self._ties[tie] -= 1
+            if self._ties[tie] <= 0:
+                del self._ties[tie]
+        self._triangle_hints.pop((category, index), None)
+
+        if not isinstance(item, dict):
+            return
+        references = item.get("members") if isinstance(item.get("members"), list) else []
+        members = list(dict.fromkeys(key for key in map(self._resolve, references) if key))
+
+        if category == "relationships":
+            text = " ".join(str(item.get(field) or "") for field in ("type", "quality")).lower()
+            structural = str(item.get("type") or "").lower()
+            kinds = [kind for kind, keywords in STRUCTURAL_KEYWORDS.items() if _matches(structural, keywords)]
+        else:
+            text_field = "pattern" if category == "dynamics" else "description"
+            text = " ".join(str(item.get(field) or "") for field in ("type", text_field)).lower()
+            kinds = []
+            if len(members) >= 3 and _matches(text, TRIANGLE_KEYWORDS):
+                self._triangle_hints[(category, index)] = tuple(members[:3])
+        kinds += classify_ties(text)
+
+        ties = []
+        for kind in kinds:
+            if len(members) == 1 and kind == "cutoff":
+                ties.append((members[0], None, kind))
+            for a, b in combinations(sorted(members), 2):
+                ties.append((a, b, kind))
+        for tie in ties:
+            self._ties[tie] += 1
+        if ties:
+            self._item_ties[(category, index)] = ties
+
+    def _neighbors(self) -> Dict[str, Dict[str, set]]:
+        """Person key -> other person key -> tie kinds between them."""
+        neighbors = {}
+        for a, b, kind in self._ties:
+            if b is None:
+                continue
+            neighbors.setdefault(a, {}).setdefault(b, set()).add(kind)
+            neighbors.setdefault(b, {}).setdefault(a, set()).add(kind)
+        return neighbors
+
+    def _label(self, key: str) -> str:
+        return self._people[key]["label"]
+
+    def _triangles(self, neighbors) -> List[Dict[str, Any]]:
+        """Third people drawn into a negative tie between two others."""
+        found = {}
+        for key, members in self._triangle_hints.items():
+            found[frozenset(members)] = {
+                "members": [self._label(m) for m in members],
+                "conflict": None,
+                "source": "described",
+            }
+        for a, others in neighbors.items():
+            for b, kinds in others.items():
+                if a >= b or not kinds & set(NEGATIVE_TIES):
+                    continue
+                for c in set(others) & set(neighbors.get(b, {})):
+                    if c in (a, b) or frozenset((a, b, c)) in found:
+                        continue
+                    if (neighbors[a][c] | neighbors[b][c]) & set(POSITIVE_TIES):
+                        found[frozenset((a, b, c))] = {
+                            "members": [self._label(a), self._label(b), self._label(c)],
+                            "conflict": [self._label(a), self._label(b)],
+                            "drawn_in": self._label(c),
+                            "source": "derived",
+                        }
+        return list(found.values())
+
+    def _cutoffs(self) -> List[List[str]]:
+        cutoffs = []
+        for a, b, kind in sorted(self._ties, key=lambda tie: (tie[0], tie[1] or "")):
+            if kind == "cutoff":
+                cutoffs.append([self._label(a)] + ([self._label(b)] if b else []))
+        return cutoffs
+
+    def _coalitions(self, neighbors) -> List[Dict[str, Any]]:
+        """Alliances, flagging cross-generational ones against the other parent figure."""
+        coalitions = []
+        for a, others in neighbors.items():
+            for b, kinds in others.items():
+                if a >= b:
+                    continue
+                gen_a, gen_b = self._people[a]["generation"], self._people[b]["generation"]
+                cross = gen_a is not None and gen_b is not None and gen_a != gen_b
+                if "alliance" not in kinds and not (cross and kinds & {"close", "enmeshed"}):
+                    continue
+                elder = a if cross and gen_a < gen_b else b
+                against = [
+                    self._label(q)
+                    for q, q_kinds in neighbors.get(elder, {}).items()
+                    if q not in (a, b)
+                    and self._people[q]["generation"] == self._people[elder]["generation"]
+                    and q_kinds & set(NEGATIVE_TIES)
+                ] if cross else []
+                if "alliance" in kinds or against:
+                    coalitions.append(
+                        {
+                            "members": [self._label(a), self._label(b)],
+                            "cross_generational": cross,
+                            "against": sorted(against),
+                        }
+                    )
+        return coalitions
+
+    def _sibling_positions(self) -> Dict[str, str]:
+        siblings = [
+            key
+            for key, person in self._people.items()
+            if person["generation"] == 2
+            and person["role"]
+            and any(re.search(rf"\b{role}", person["role"].lower()) for role in SIBLING_ROLES)
+        ]
+        positions = {}
+        count = len(siblings)
+        aged = sorted((p for p in siblings if self._people[p]["age"] is not None), key=lambda p: -self._people[p]["age"])
+        if count > 1 and len(aged) == count:
+            for rank, key in enumerate(aged):
+                position = "oldest" if rank == 0 else "youngest" if rank == count - 1 else "middle"
+                positions[self._label(key)] = f"{position} of {count}"
+        for key in siblings:
+            if self._label(key) in positions:
+                continue
+            match = _ORDINAL_RE.search(self._people[key]["text"])
+            if match:
+                word = match.group(1)
+                word = {"eldest": "oldest", "first-born": "oldest", "firstborn": "oldest",
+                        "baby of the family": "youngest"}.get(word, word)
+                positions[self._label(key)] = f"{word} of {count}" if count > 1 else word
+            elif count == 1 and "only child" in self._people[key]["text"]:
+                positions[self._label(key)] = "only child"
+        return positions
+
+    def _boundaries(self, neighbors) -> Dict[str, str]:
+        """Classify the boundary between each pair of generational subsystems that interact."""
+        crossing = {}
+        for a, others in neighbors.items():
+            for b, kinds in others.items():
+                gen_a, gen_b = self._people[a]["generation"], self._people[b]["generation"]
+                if a >= b or gen_a is None or gen_b is None or gen_a == gen_b:
+                    continue
+                pair = (min(gen_a, gen_b), max(gen_a, gen_b))
+                crossing.setdefault(pair, Counter()).update(kinds)
+
+        boundaries = {}
+        for (upper, lower), kinds in sorted(crossing.items()):
+            name = f"{SUBSYSTEM_NAMES.get(upper, upper)}/{SUBSYSTEM_NAMES.get(lower, lower)}"
+            if kinds["alliance"] or kinds["enmeshed"]:
+                boundaries[name] = "diffuse"
+            elif (kinds["cutoff"] or kinds["distant"]) and not kinds["close"]:
+                boundaries[name] = "rigid"
+            elif kinds["close"] or kinds["conflict"]:
+                boundaries[name] = "clear"
+        return boundaries
+
+    def summary(self, extractor) -> Dict[str, Any]:
+        """
+        Get the structural metrics for the extractor's current data.
+
+        Args:
+            extractor: The data extractor whose family_data is analyzed
+
+        Returns:
+            Dictionary with triangles, cutoffs, coalitions, conflicts,
+            sibling_positions and boundaries
+        """
+        self.update(extractor)
+        if self._summary is not None and self._summary_revision == self.revision:
+            return self._summary
+
+        neighbors = self._neighbors()
+        conflicts = sorted(
+            [self._label(a), self._label(b)]
+            for a, b, kind in self._ties
+            if b is not None and kind == "conflict"
+        )
+        self._summary = {
+            "triangles": self._triangles(neighbors),
+            "cutoffs": self._cutoffs(),
+            "coalitions": self._coalitions(neighbors),
+            "conflicts": conflicts,
+            "sibling_positions": self._sibling_positions(),
+            "boundaries": self._boundaries(neighbors),
+        }
+        self._summary_revision = self.revision
+        return self._summary
+
+
+def format_summary(summary: Dict[str, Any], max_items: int = MAX_SUMMARY_ITEMS) -> Optional[str]:
+    """
+    Format structural metrics as a compact prompt section.
+
+    Args:
+        summary: Output of GenogramAnalyzer.summary
+        max_items: Maximum entries listed per metric
+
+    Returns:
+        A "FAMILY STRUCTURE:" section, or None if nothing was found
+    """
+    lines = []
+
+    def add(title: str, entries: List[str]) -> None:
+        if entries:
+            more = f" (+{len(entries) - max_items} more)" if len(entries) > max_items else ""
+            lines.append(f" - {title}: " + "; ".join(entries[:max_items]) + more)
+
+    triangles = []
+    for triangle in summary["triangles"]:
+        if triangle.get("conflict"):
+            triangles.append(f"{triangle['drawn_in']} drawn into {' vs '.join(triangle['conflict'])}")
+        else:
+            triangles.append(" / ".join(triangle["members"]))
+    add("Triangles", triangles)
+    add("Conflicts", [" vs ".join(pair) for pair in summary["conflicts"]])
+    add("Cutoffs", [" from ".join(c) if len(c) > 1 else f"{c[0]} cut off" for c in summary["cutoffs"]])
+
+    coalitions = []
+    for coalition in summary["coalitions"]:
+        entry = " + ".join(coalition["members"])
+        if coalition["cross_generational"]:
+            entry += " (cross-generational)"
+        if coalition["against"]:
+            entry += " against " + ", ".join(coalition["against"])
+        coalitions.append(entry)
+    add("Coalitions", coalitions)
+    add("Sibling positions", [f"{label} {position}" for label, position in summary["sibling_positions"].items()])
+    add("Subsystem boundaries", [f"{pair} {kind}" for pair, kind in summary["boundaries"].items()])
+
+    if not lines:
+        return None
+    return "FAMILY STRUCTURE:\n" + "\n".join(lines)
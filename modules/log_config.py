@@ -0,0 +1,178 @@
+# modules/log_config.py
+import os
+import sys
+import json
+import queue
+import atexit
+import time
+import random
+import hashlib
+import logging
+import logging.handlers
+from typing import Any, Optional
+
+# Fraction of per-message events that are logged (0 disables them, 1 logs all)
+MESSAGE_LOG_SAMPLE_RATE = float(os.environ.get("FDA_LOG_SAMPLE_RATE", 0.1))
+
+# Message content is redacted unless explicitly enabled for local debugging
+LOG_MESSAGE_CONTENT = os.environ.get("FDA_LOG_MESSAGE_CONTENT", "") == "1"
+
+# Seconds the listener waits after a record so it can handle a batch per wakeup
+LOG_BATCH_DELAY = float(os.environ.get("FDA_LOG_BATCH_DELAY", 0.05))
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+    The stock QueueHandler.prepare formats and copies every record on the
+    calling thread; this one only resolves the message arguments in place, so
+    they cannot change while the record waits in the queue, and keeps exc_info
+    for the JsonFormatter. It sits on the root logger, the last handler to see
+    a record, so no other handler observes the change.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # The queue is thread-safe, so the handler lock is not needed
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener that handles records in batches. Waking the listener for
+    every record makes it take the GIL from the request thread once per record;
+    waiting briefly after the first record lets it handle everything queued in
+    one go.
+    """
+
+    def __init__(self, log_queue, *handlers, batch_delay: float = LOG_BATCH_DELAY, **kwargs):
+        super().__init__(log_queue, *handlers, **kwargs)
+        self.batch_delay = batch_delay
+
+    def _monitor(self) -> None:
+        while True:
+            batch = [self.dequeue(True)]
+            if batch[0] is not self._sentinel and self.batch_delay > 0:
+                time.sleep(self.batch_delay)
+            while True:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is self._sentinel:
+                    return
+                self.handle(record)
+
+
+def setup_logging(level: int = logging.INFO, stream=None) -> None:
+    """
+    Route all logging through a queue so request threads never block on I/O.
+    A background listener formats records as JSON and writes them to the stream.
+
+    Args:
+        level: Root log level
+        stream: Output stream, defaults to stderr
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    # The JSON output has no caller, process or thread fields, so skip collecting
+    # them on the request thread (see "Optimization" in the logging docs)
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = BatchingQueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def redact(text: Optional[str]) -> Any:
+    """
+    Replace message content with its length and a short hash.
+
+    Args:
+        text: Message content
+
+    Returns:
+        The content itself if content logging is enabled, otherwise a summary
+    """
+    if text is None:
+        return None
+    if LOG_MESSAGE_CONTENT:
+        return text
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    return {"chars": len(text), "sha": digest}
+
+
+def log_message_event(
+    logger: logging.Logger, event: str, session_id: Optional[str], content: Optional[str], **fields: Any
+) -> None:
+    """
+    Log a per-message event, subject to sampling, with the content redacted.
+
+    Args:
+        logger: Logger to write to
+        event: Event name, e.g. "chat.user_input"
+        session_id: Session the message belongs to
+        content: Message content, redacted before logging
+        fields: Additional structured fields
+    """
+    if MESSAGE_LOG_SAMPLE_RATE <= 0 or not logger.isEnabledFor(logging.INFO):
+        return
+    if MESSAGE_LOG_SAMPLE_RATE < 1 and random.random() >= MESSAGE_LOG_SAMPLE_RATE:
+        return
+
+    logger.info(
+        event,
+        extra={"fields": {"session_id": session_id, "content": redact(content), **fields}},
+    )
@@ -0,0 +1,331 @@
+# modules/memory_accounting.py
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import tracemalloc
+from collections import deque
+from types import ModuleType, FunctionType, BuiltinFunctionType, MethodType
+from typing import Dict, Any, List, Optional
+
+from modules.conversation import SYSTEM_PROMPT, INITIAL_GREETING
+from modules.conversation_state import (
+    INITIAL_PHASE,
+    PHASE_TRANSITIONS,
+    compose_system_prompt,
+    compose_system_blocks,
+)
+
+# Seconds between background sweeps; 0 disables them
+MEMORY_SWEEP_INTERVAL = float(os.environ.get("FDA_MEMORY_SWEEP_INTERVAL", 60))
+
+# Sessions measured per sweep; the total is extrapolated from this random sample
+MEMORY_SWEEP_SAMPLE = int(os.environ.get("FDA_MEMORY_SWEEP_SAMPLE", 50))
+
+# Approximate bytes all sessions may use before idle ones are evicted; 0 disables eviction
+SESSION_MEMORY_LIMIT = int(os.environ.get("FDA_SESSION_MEMORY_LIMIT", 0))
+
+# Sessions must be idle for this many seconds before they can be evicted
+EVICTION_IDLE_SECONDS = float(os.environ.get("FDA_EVICTION_IDLE_SECONDS", 600))
+
+# Number of tracemalloc frames to keep per allocation; 0 leaves tracemalloc off
+TRACEMALLOC_FRAMES = int(os.environ.get("FDA_TRACEMALLOC_FRAMES", 0))
+
+# Number of sessions and allocation sites listed in reports
+TOP_N = 10
+
+# Objects that belong to the process rather than a session
+_SKIP_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Approximate the memory used by an object and everything it references.
+
+    Args:
+        obj: Object to measure
+        seen: Ids of objects already counted; shared between calls so that
+            objects referenced from several places are only counted once
+
+    Returns:
+        Size in bytes
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, int, float, bool)):
+            attributes = getattr(current, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+_shared_ids = None
+
+
+def _get_shared_ids() -> set:
+    """Ids of the prompts every conversation shares, which are not charged to any session."""
+    global _shared_ids
+    if _shared_ids is None:
+        shared = [SYSTEM_PROMPT, INITIAL_GREETING]
+        for phase in [INITIAL_PHASE] + [t["next_phase"] for t in PHASE_TRANSITIONS.values()]:
+            shared.append(compose_system_prompt(SYSTEM_PROMPT, phase))
+            shared.append(compose_system_blocks(SYSTEM_PROMPT, phase))
+        seen = set()
+        for obj in shared:
+            deep_size(obj, seen)
+        _shared_ids = seen
+    return _shared_ids
+
+
+def start_tracemalloc(frames: int = TRACEMALLOC_FRAMES) -> bool:
+    """
+    Start tracing allocations if configured.
+
+    Args:
+        frames: Number of frames to keep per allocation; 0 leaves tracing off
+
+    Returns:
+        True if tracemalloc is tracing
+    """
+    if frames > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logging.info(f"tracemalloc started with {frames} frames")
+    return tracemalloc.is_tracing()
+
+
+class SessionMemoryAccountant:
+    """
+    Measures approximate memory per conversation session and evicts the largest
+    idle sessions when the total goes over a limit. Only sessions whose state is
+    fully written to their transcript log are evicted, since they are resumed
+    from it on the next request. Sweeps are meant to run on a background thread
+    and only measure a sample of sessions unless eviction may be needed.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int = SESSION_MEMORY_LIMIT,
+        idle_seconds: float = EVICTION_IDLE_SECONDS,
+        sample_size: int = MEMORY_SWEEP_SAMPLE,
+    ):
+        """
+        Initialize the accountant.
+
+        Args:
+            memory_limit: Approximate byte limit for all sessions; 0 disables eviction
+            idle_seconds: Minimum idle time before a session can be evicted
+            sample_size: Sessions measured per sweep before extrapolating
+        """
+        self.memory_limit = memory_limit
+        self.sample_size = sample_size
+        self.idle_seconds = idle_seconds
+        self.last_report = None
+        self._last_active = {}  # Session id -> time of last request
+        self._last_snapshot = None
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str) -> None:
+        """Record that a session was just used."""
+        self._last_active[session_id] = time.time()
+
+    def forget(self, session_id: str) -> None:
+        """Stop tracking a session that was removed."""
+        self._last_active.pop(session_id, None)
+
+    def measure(self, conversation) -> Dict[str, int]:
+        """
+        Measure the memory held by one conversation, broken down by component.
+
+        Args:
+            conversation: FamilyDynamicsConversation instance
+
+        Returns:
+            Dictionary of bytes per component plus "total"
+        """
+        seen = set(_get_shared_ids())
+        extractor = conversation._data_extractor
+        components = {
+            "history": deep_size(conversation.conversation_history, seen),
+            "system_prompt": deep_size(conversation.state, seen)
+            + deep_size(conversation.state.system_blocks, seen),
+            "saved_data": deep_size(conversation.saved_data, seen)
+            + deep_size(conversation._context_selector, seen),
+            "family_data": deep_size(extractor.family_data, seen) if extractor else 0,
+            "extractor_index": deep_size(extractor, seen) if extractor else 0,
+            "transcript_index": deep_size(conversation.transcript, seen),
+        }
+        components["total"] = sum(components.values())
+        return components
+
+    def _measure_all(
+        self, sessions: Dict[str, Any], sample_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Measure every session, or a random sample of them, largest first."""
+        now = time.time()
+        sizes = []
+        items = list(sessions.items())
+        if sample_size is not None and len(items) > sample_size:
+            items = random.sample(items, sample_size)
+        for session_id, conversation in items:
+            try:
+                components = self.measure(conversation)
+            except RuntimeError:
+                # Changed by a request while being measured; counted in the next sweep
+                continue
+            components["session_id"] = session_id
+            last_active = self._last_active.get(session_id)
+            components["idle_seconds"] = round(now - last_active, 1) if last_active else None
+            components["resumable"] = conversation.is_persisted()
+            sizes.append(components)
+            # Let request threads run between sessions
+            time.sleep(0)
+        sizes.sort(key=lambda entry: entry["total"], reverse=True)
+        return sizes
+
+    def report(self, sessions: Dict[str, Any], top_n: int = TOP_N) -> Dict[str, Any]:
+        """
+        Measure every session.
+
+        Args:
+            sessions: Session id -> conversation
+            top_n: Number of largest sessions to list
+
+        Returns:
+            Dictionary with session_count, total_bytes, top_sessions and measure_ms
+        """
+        start = time.perf_counter()
+        sizes = self._measure_all(sessions)
+        return self._summarize(sizes, start, top_n)
+
+    def _summarize(self, sizes: List[Dict[str, Any]], start: float, top_n: int) -> Dict[str, Any]:
+        report = {
+            "session_count": len(sizes),
+            "total_bytes": sum(entry["total"] for entry in sizes),
+            "top_sessions": sizes[:top_n],
+            "measure_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        self.last_report = report
+        return report
+
+    def sweep(self, sessions: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estimate the memory of all sessions from a sample, log it, and measure
+        every session to evict some only if the estimate is over the limit.
+
+        Args:
+            sessions: Session id -> conversation, modified in place on eviction
+
+        Returns:
+            The report, with "sampled" set when the total is an estimate and the
+            ids of any evicted sessions under "evicted"
+        """
+        with self._lock:
+            start = time.perf_counter()
+            session_count = len(sessions)
+            sizes = self._measure_all(sessions, self.sample_size)
+            report = self._summarize(sizes, start, TOP_N)
+            if len(sizes) < session_count:
+                report["sampled"] = len(sizes)
+                report["session_count"] = session_count
+                if sizes:
+                    report["total_bytes"] = report["total_bytes"] * session_count // len(sizes)
+
+            report["evicted"] = []
+            if self.memory_limit and report["total_bytes"] > self.memory_limit:
+                if "sampled" in report:
+                    sizes = self._measure_all(sessions)
+                    report = self._summarize(sizes, start, TOP_N)
+                report["evicted"] = self._evict(sessions, sizes, report["total_bytes"])
+
+        logging.getLogger(__name__).info(
+            "Session memory sweep",
+            extra={
+                "fields": {
+                    "session_count": report["session_count"],
+                    "sampled": report.get("sampled", report["session_count"]),
+                    "total_bytes": report["total_bytes"],
+                    "largest_bytes": sizes[0]["total"] if sizes else 0,
+                    "evicted": len(report["evicted"]),
+                    "measure_ms": report["measure_ms"],
+                }
+            },
+        )
+        return report
+
+    def _evict(self, sessions: Dict[str, Any], sizes: List[Dict[str, Any]], total: int) -> List[str]:
+        """Drop the largest idle sessions with persisted state until the total fits the limit."""
+        if not self.memory_limit or total <= self.memory_limit:
+            return []
+
+        evicted = []
+        for entry in sizes:
+            if total <= self.memory_limit:
+                break
+            idle = entry["idle_seconds"]
+            if not entry["resumable"] or idle is None or idle < self.idle_seconds:
+                continue
+            sessions.pop(entry["session_id"], None)
+            self.forget(entry["session_id"])
+            total -= entry["total"]
+            evicted.append(entry["session_id"])
+
+        if evicted:
+            logging.info(f"Evicted {len(evicted)} idle sessions to stay under {self.memory_limit} bytes")
+        return evicted
+
+    def tracemalloc_snapshot(self, top_n: int = TOP_N) -> Dict[str, Any]:
+        """
+        Take a tracemalloc snapshot and compare it with the previous one.
+
+        Args:
+            top_n: Number of allocation sites to list
+
+        Returns:
+            Dictionary with traced and peak bytes, the largest allocation sites
+            and the biggest changes since the last snapshot
+        """
+        if not tracemalloc.is_tracing():
+            return {"enabled": False}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "enabled": True,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top_n]
+            ],
+        }
+
+        with self._lock:
+            previous, self._last_snapshot = self._last_snapshot, snapshot
+        if previous is not None:
+            result["diff"] = [
+                {"location": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in snapshot.compare_to(previous, "lineno")[:top_n]
+            ]
+        return result
@@ -0,0 +1,268 @@
+# modules/model_router.py
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+from modules.tracing import get_current_span
+from modules.cassette import wrap_client
+
+# Models used by the default routing table
+DEFAULT_MODEL = "claude-3-7-sonnet-20250219"
+FAST_MODEL = "claude-3-5-haiku-20241022"
+
+# Routing table: one entry per task that talks to the LLM.
+# Every field can be overridden with an environment variable named
+# FDA_<FIELD>_<TASK>, e.g. FDA_MODEL_CHAT or FDA_LATENCY_BUDGET_EXTRACTION.
+MODEL_CONFIG = {
+    "chat": {
+        "model": DEFAULT_MODEL,
+        "fallback_model": FAST_MODEL,
+        "latency_budget": None,  # Seconds; None disables the fallback
+        "max_tokens": 1000,
+        "temperature": 0.7,
+    },
+    "welcome": {
+        "model": FAST_MODEL,
+        "fallback_model": None,
+        "latency_budget": None,
+        "max_tokens": 300,
+        "temperature": 0.7,
+    },
+    "extraction": {
+        "model": FAST_MODEL,
+        "fallback_model": None,
+        "latency_budget": None,
+        "max_tokens": 1000,
+        "temperature": 0.2,  # Lower temperature for more consistent extraction
+    },
+}
+
+
+class ModelRouter:
+    """
+    Routes LLM calls to the model configured for each task.
+    Applies an optional latency budget with fallback to a faster model,
+    and keeps latency and token usage metrics per model.
+    """
+
+    def __init__(self, api_key: str, config: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            api_key: Anthropic API key
+            config: Optional routing table, defaults to MODEL_CONFIG
+        """
+        self.api_key = api_key
+        self.config = config or MODEL_CONFIG
+        self._client = None
+        self._lock = threading.Lock()
+        self.metrics = {}
+
+    def get_task_config(self, task: str) -> Dict[str, Any]:
+        """
+        Get the routing configuration for a task, applying environment overrides.
+
+        Args:
+            task: Task name (chat, welcome or extraction)
+
+        Returns:
+            Dictionary with model, fallback_model, latency_budget, max_tokens and temperature
+        """
+        if task not in self.config:
+            raise ValueError(f"Unknown model task: {task}")
+
+        task_config = dict(self.config[task])
+        for field, value in task_config.items():
+            override = os.environ.get(f"FDA_{field.upper()}_{task.upper()}")
+            if override is None:
+                continue
+            if field in ("latency_budget", "temperature"):
+                task_config[field] = float(override) if override else None
+            elif field == "max_tokens":
+                task_config[field] = int(override)
+            else:
+                task_config[field] = override or None
+
+        return task_config
+
+    def _get_client(self):
+        """Create the Anthropic client once and reuse it for every call."""
+        if self._client is None:
+            from anthropic import Anthropic
+
+            # Recorded or replayed through a cassette when FDA_LLM_CASSETTE_MODE is set
+            self._client = wrap_client(lambda: Anthropic(api_key=self.api_key))
+        return self._client
+
+    def create_message(self, task: str, system: Any, messages: List[Dict[str, Any]]):
+        """
+        Call the model configured for a task.
+
+        If the task has a latency budget and a fallback model, the primary model
+        is given the budget as its timeout and the fallback model is used when it
+        is exceeded.
+
+        Args:
+            task: Task name (chat, welcome or extraction)
+            system: System prompt passed to the API
+            messages: User and assistant messages
+
+        Returns:
+            The API response message
+        """
+        task_config = self.get_task_config(task)
+        client = self._get_client()
+        model = task_config["model"]
+        fallback_model = task_config["fallback_model"]
+        budget = task_config["latency_budget"]
+
+        request = {
+            "max_tokens": task_config["max_tokens"],
+            "system": system,
+            "messages": messages,
+            "temperature": task_config["temperature"],
+        }
+
+        if budget and fallback_model and fallback_model != model:
+            from anthropic import APITimeoutError
+
+            try:
+                return self._timed_call(
+                    client.with_options(timeout=budget, max_retries=0), model, request
+                )
+            except APITimeoutError:
+                logging.warning(
+                    f"Model {model} exceeded {budget}s budget for {task}, "
+                    f"falling back to {fallback_model}"
+                )
+                self._record(model, budget, None, fallback=True)
+                return self._timed_call(client, fallback_model, request)
+
+        return self._timed_call(client, model, request)
+
+    def _timed_call(self, client, model: str, request: Dict[str, Any]):
+        """Call the API and record latency and usage for the model."""
+        start = time.perf_counter()
+        try:
+            response = client.messages.create(model=model, **request)
+        except Exception:
+            self._record(model, time.perf_counter() - start, None, error=True)
+            raise
+
+        latency = time.perf_counter() - start
+        usage = getattr(response, "usage", None)
+        self._record(model, latency, usage)
+
+        # Annotate the caller's span with what the call cost
+        get_current_span().set_attributes(
+            {
+                "llm.model": model,
+                "llm.latency_ms": round(latency * 1000, 2),
+                "llm.input_tokens": getattr(usage, "input_tokens", None),
+                "llm.output_tokens": getattr(usage, "output_tokens", None),
+            }
+        )
+        return response
+
+    def _record(
+        self,
+        model: str,
+        latency: float,
+        usage: Any,
+        error: bool = False,
+        fallback: bool = False,
+    ) -> None:
+        """Update the running metrics for a model."""
+        with self._lock:
+            stats = self.metrics.setdefault(
+                model,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "fallbacks": 0,
+                    "total_latency": 0.0,
+                    "max_latency": 0.0,
+                    "input_tokens": 0,
+                    "output_tokens": 0,
+                },
+            )
+            if fallback:
+                stats["fallbacks"] += 1
+                return
+
+            stats["calls"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            if error:
+                stats["errors"] += 1
+            if usage is not None:
+                stats["input_tokens"] += getattr(usage, "input_tokens", 0) or 0
+                stats["output_tokens"] += getattr(usage, "output_tokens", 0) or 0
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get a snapshot of the per-model metrics.
+
+        Returns:
+            Dictionary keyed by model name with call counts, latency and token usage
+        """
+        with self._lock:
+            snapshot = {}
+            for model, stats in self.metrics.items():
+                model_stats = dict(stats)
+                model_stats["avg_latency"] = (
+                    stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0
+                )
+                snapshot[model] = model_stats
+            return snapshot
+
+
+# Routers are shared per API key so all sessions reuse one client and one set of metrics
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(api_key: str) -> ModelRouter:
+    """
+    Get the shared router for an API key.
+
+    Args:
+        api_key: Anthropic API key
+
+    Returns:
+        The ModelRouter instance for that key
+    """
+    with _routers_lock:
+        router = _routers.get(api_key)
+        if router is None:
+            router = ModelRouter(api_key)
+            _routers[api_key] = router
+        return router
+
+
+def get_all_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Merge the metrics of every router.
+
+    Returns:
+        Dictionary keyed by model name with call counts, latency and token usage
+    """
+    merged = {}
+    with _routers_lock:
+        routers = list(_routers.values())
+
+    for router in routers:
+        for model, stats in router.get_metrics().items():
+            if model not in merged:
+                merged[model] = stats
+                continue
+            total = merged[model]
+            for key in ("calls", "errors", "fallbacks", "total_latency", "input_tokens", "output_tokens"):
+                total[key] += stats[key]
+            total["max_latency"] = max(total["max_latency"], stats["max_latency"])
+            total["avg_latency"] = (
+                total["total_latency"] / total["calls"] if total["calls"] else 0.0
+            )
+    return merged
@@ -0,0 +1,164 @@
+# modules/static_assets.py
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+from flask import Flask, request, send_file, url_for, abort
+
+# File types worth precompressing (images are already compressed)
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+
+# Precompressed variants, in order of preference when the client accepts both equally
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Fingerprinted files never change, so browsers may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticAssetPipeline:
+    """
+    Content-hashes static files, precompresses them with gzip (and brotli when
+    installed) and serves them with long-lived immutable caching.
+    """
+
+    def __init__(self, static_folder: str, build_folder: str):
+        """
+        Initialize the pipeline.
+
+        Args:
+            static_folder: Directory containing the source static files
+            build_folder: Directory the fingerprinted files are written to
+        """
+        self.static_folder = static_folder
+        self.build_folder = build_folder
+        self.manifest = {}  # Source path -> fingerprinted path
+
+    def build(self) -> Dict[str, str]:
+        """
+        Fingerprint and precompress every file in the static folder.
+        Files that are already built are left untouched.
+
+        Returns:
+            Manifest mapping source paths to fingerprinted paths
+        """
+        os.makedirs(self.build_folder, exist_ok=True)
+        manifest = {}
+
+        for root, _, files in os.walk(self.static_folder):
+            for filename in files:
+                source_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(source_path, self.static_folder).replace(os.sep, "/")
+
+                with open(source_path, "rb") as f:
+                    content = f.read()
+
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                base, ext = os.path.splitext(relative_path)
+                hashed_path = f"{base}.{digest}{ext}"
+                target_path = os.path.join(self.build_folder, hashed_path)
+
+                if not os.path.exists(target_path):
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    self._write(target_path, content)
+                    if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+                        self._write(target_path + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+                        if brotli is not None:
+                            self._write(target_path + ".br", brotli.compress(content))
+
+                manifest[relative_path] = hashed_path
+
+        self.manifest = manifest
+        logging.info(f"Built {len(manifest)} fingerprinted static assets")
+        return manifest
+
+    def _write(self, path: str, content: bytes) -> None:
+        """Write a file atomically so concurrent workers never serve a partial file."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def asset_url(self, filename: str) -> str:
+        """
+        Get the URL for a static file, fingerprinted if it has been built.
+
+        Args:
+            filename: Path relative to the static folder
+
+        Returns:
+            URL of the fingerprinted file, or the regular static URL as a fallback
+        """
+        hashed_path = self.manifest.get(filename)
+        if hashed_path is None:
+            return url_for("static", filename=filename)
+        return url_for("assets", filename=hashed_path)
+
+    def serve(self, filename: str):
+        """
+        Serve a fingerprinted file, picking the best precompressed variant the client accepts.
+
+        Args:
+            filename: Fingerprinted path relative to the build folder
+        """
+        # Compressed variants are only served through content negotiation
+        if filename.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            abort(404)
+
+        path = os.path.realpath(os.path.join(self.build_folder, filename))
+        if not path.startswith(os.path.realpath(self.build_folder) + os.sep) or not os.path.isfile(path):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        # Pick the variant with the highest q-value; q=0 means not acceptable
+        encoding: Optional[str] = None
+        best_quality = 0
+        for candidate, suffix in ENCODINGS:
+            quality = request.accept_encodings.quality(candidate)
+            if quality > best_quality and os.path.isfile(path + suffix):
+                encoding, best_quality = candidate, quality
+        if encoding:
+            path += dict(ENCODINGS)[encoding]
+
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add("Accept-Encoding")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Build the assets, register the asset route and expose asset_url to templates.
+        Falls back to the default static handler if the build folder is not writable.
+
+        Args:
+            app: The Flask application
+        """
+        try:
+            self.build()
+        except OSError as e:
+            logging.warning(f"Could not build static assets, serving unfingerprinted files: {e}")
+            self.manifest = {}
+
+        app.add_url_rule("/assets/<path:filename>", "assets", self.serve)
+        app.jinja_env.globals["asset_url"] = self.asset_url
+
+
+if __name__ == "__main__":
+    # Build step: python -m modules.static_assets
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pipeline = StaticAssetPipeline(
+        os.path.join(root, "static"),
+        os.environ.get("FDA_ASSET_BUILD_DIR", os.path.join(root, "build", "static")),
+    )
+    for source, hashed in sorted(pipeline.build().items()):
+        print(f"{source} -> {hashed}")
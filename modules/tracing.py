@@ -0,0 +1,302 @@
+# modules/tracing.py
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+# Fraction of root spans (requests) that are recorded; 0 disables tracing
+TRACE_SAMPLE_RATE = float(os.environ.get("FDA_TRACE_SAMPLE_RATE", 0))
+
+# JSON-lines file finished traces are written to
+TRACE_FILE = os.environ.get("FDA_TRACE_FILE", "traces.jsonl")
+
+
+class Span:
+    """
+    A timed operation with attributes, following the OpenTelemetry span interface
+    (set_attribute, set_attributes, record_exception, set_status, end).
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], tracer: "Tracer"):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = {}
+        self.status = "UNSET"
+        self.events = []
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self._tracer = tracer
+        self._children = []  # Finished descendant spans, collected on the root
+        self._root = self
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        self.status = status
+        if description:
+            self.attributes["status.description"] = description
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.events.append(
+            {
+                "name": "exception",
+                "time": time.time_ns(),
+                "attributes": {
+                    "exception.type": type(exception).__name__,
+                    "exception.message": str(exception),
+                },
+            }
+        )
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            self._tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the span in a flat, OTLP-like shape."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": (self.end_time - self.start_time) / 1e6 if self.end_time else None,
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class NonRecordingSpan:
+    """Span returned when a trace is not sampled; every method is a no-op."""
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+INVALID_SPAN = NonRecordingSpan()
+
+_current_span = contextvars.ContextVar("fda_current_span", default=None)
+
+
+def get_current_span():
+    """
+    Get the active span, or a non-recording span when there is none.
+
+    Returns:
+        The current Span or INVALID_SPAN
+    """
+    span = _current_span.get()
+    return span if span is not None else INVALID_SPAN
+
+
+class JsonLinesSpanExporter:
+    """Appends finished traces to a local JSON-lines file, one span per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logging.warning(f"Could not export spans to {self.path}: {e}")
+
+
+class QueuedSpanExporter:
+    """
+    Hands finished traces to a background thread that serializes and writes
+    them, so sampled requests never wait on file I/O. Mirrors the logging
+    queue: the thread starts on the first export and is flushed at exit.
+    """
+
+    _STOP = object()
+
+    def __init__(self, exporter: JsonLinesSpanExporter):
+        """
+        Initialize the exporter.
+
+        Args:
+            exporter: Exporter the background thread writes through
+        """
+        self.exporter = exporter
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(spans)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            spans = [span for trace in batch if trace is not self._STOP for span in trace]
+            if spans:
+                self.exporter.export(spans)
+            if any(trace is self._STOP for trace in batch):
+                return
+
+    def shutdown(self) -> None:
+        """Write any queued traces and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+
+
+class Tracer:
+    """
+    Creates spans and decides per root span whether the trace is sampled.
+    Child spans follow their root's decision.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = TRACE_SAMPLE_RATE):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter: Where finished traces are sent, defaults to a background
+                writer appending to TRACE_FILE
+            sample_rate: Fraction of root spans to record
+        """
+        self.exporter = exporter or QueuedSpanExporter(JsonLinesSpanExporter(TRACE_FILE))
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Start a span, make it current for the duration of the block and end it afterwards.
+
+        Args:
+            name: Span name
+            attributes: Optional initial attributes
+
+        Yields:
+            The Span, or INVALID_SPAN if the trace is not sampled
+        """
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+                # Mark the context as unsampled so children skip the sampling decision
+                token = _current_span.set(INVALID_SPAN)
+                try:
+                    yield INVALID_SPAN
+                finally:
+                    _current_span.reset(token)
+                return
+            span = Span(name, f"{random.getrandbits(128):032x}", None, self)
+        elif isinstance(parent, NonRecordingSpan):
+            yield INVALID_SPAN
+            return
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, self)
+            span._root = parent._root
+
+        if attributes:
+            span.set_attributes(attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status("ERROR", str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def _on_end(self, span: Span) -> None:
+        """Collect finished spans on their root and export the trace once the root ends."""
+        root = span._root
+        if span is not root:
+            root._children.append(span)
+            return
+        self.exporter.export(root._children + [root])
+        root._children = []
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """
+    Get the shared tracer.
+
+    Returns:
+        The module-level Tracer
+    """
+    return _tracer
+
+
+def traced(name: str):
+    """
+    Decorator that runs a function inside a span with the given name.
+    Inside the function, get_current_span() returns that span for adding attributes.
+
+    Args:
+        name: Span name
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
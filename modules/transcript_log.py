@@ -0,0 +1,169 @@
+# modules/transcript_log.py
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+from array import array
+from typing import Dict, Any, List, Optional
+
+
+class TranscriptLog:
+    """
+    Append-only JSON-lines transcript for one conversation session.
+    Only the byte offsets of records are kept in memory; records are read
+    back on demand through a memory map.
+
+    Each line is either a message ({"type": "message", "role", "content"})
+    or a state update ({"type": "state", ...}) such as a phase change.
+    """
+
+    def __init__(self, directory: str, session_id: str):
+        """
+        Open (or create) the transcript for a session.
+
+        Args:
+            directory: Directory holding transcript files
+            session_id: Session identifier, hashed to build the file name
+        """
+        os.makedirs(directory, exist_ok=True)
+        file_id = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        self.path = os.path.join(directory, f"{file_id}.jsonl")
+        self._message_offsets = array("Q")
+        self._state_offsets = array("Q")
+        self._size = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """Index an existing transcript, dropping a partially written last line."""
+        if not os.path.exists(self.path):
+            return
+
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.startswith(b'{"type": "message"'):
+                    self._message_offsets.append(offset)
+                elif line.startswith(b'{"type": "state"'):
+                    self._state_offsets.append(offset)
+                offset += len(line)
+
+        if offset != os.path.getsize(self.path):
+            logging.warning(f"Truncating incomplete record in transcript {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+        self._size = offset
+
+    def __len__(self) -> int:
+        """Number of messages in the transcript."""
+        return len(self._message_offsets)
+
+    def _append(self, record: Dict[str, Any], offsets: array) -> None:
+        """Append one record as a single line."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(line)
+        offsets.append(self._size)
+        self._size += len(line)
+
+    def append_message(self, role: str, content: str) -> None:
+        """
+        Append a user or assistant message.
+
+        Args:
+            role: Message role
+            content: Message text
+        """
+        self._append({"type": "message", "role": role, "content": content}, self._message_offsets)
+
+    def append_state(self, **state: Any) -> None:
+        """
+        Append a state update, e.g. append_state(phase="deep_dive").
+
+        Args:
+            state: State fields to record; later records override earlier ones
+        """
+        self._append({"type": "state", **state}, self._state_offsets)
+
+    def _read_records(self, offsets) -> List[Dict[str, Any]]:
+        """Read the records starting at the given byte offsets."""
+        if not offsets or self._size == 0:
+            return []
+
+        records = []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in offsets:
+                end = mm.find(b"\n", offset)
+                records.append(json.loads(mm[offset:end]))
+        return records
+
+    def read_messages(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Read a range of messages.
+
+        Args:
+            start: Index of the first message
+            stop: Index after the last message, defaults to the end
+
+        Returns:
+            List of {"role", "content"} messages
+        """
+        return [
+            {"role": record["role"], "content": record["content"]}
+            for record in self._read_records(self._message_offsets[start:stop])
+        ]
+
+    def read_state(self) -> Dict[str, Any]:
+        """
+        Merge all state updates.
+
+        Returns:
+            Dictionary with the latest value of each state field
+        """
+        state = {}
+        for record in self._read_records(self._state_offsets):
+            record.pop("type", None)
+            state.update(record)
+        return state
+
+    def clear(self) -> None:
+        """Remove the transcript file and reset the index."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._message_offsets = array("Q")
+        self._state_offsets = array("Q")
+        self._size = 0
+
+
+def purge_expired_transcripts(directory: str, max_age: float) -> List[str]:
+    """
+    Delete transcripts that have not been written to for longer than max_age.
+
+    Args:
+        directory: Directory holding transcript files
+        max_age: Maximum age in seconds since a transcript was last modified
+
+    Returns:
+        Paths of the removed transcripts
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    cutoff = time.time() - max_age
+    removed = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".jsonl"):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed.append(entry.path)
+        except FileNotFoundError:
+            continue
+
+    if removed:
+        logging.info(f"Removed {len(removed)} expired transcripts from {directory}")
+    return removed
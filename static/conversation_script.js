@@ -70,21 +70,26 @@ document.addEventListener("DOMContentLoaded", function () {
             }
             
             // Send to backend
-            const response = await fetch("/api/load_context", {
-                method: "POST",
-                headers: {
-                    "Content-Type": "application/json"
-                },
-                body: JSON.stringify({
-                    saved_data: savedData
-                })
-            });
+            const response = await window.saveManager.postLoadContext(savedData);
             
             if (!response.ok) {
                 throw new Error(`Server responded with status: ${response.status}`);
             }
             
             const result = await response.json();
+
+            // Remember the server's version so later saves only transfer changes
+            const version = result.version;
+            if (result.success && version && (
+                version.lineage !== savedData.lineage ||
+                version.revision !== savedData.revision ||
+                version.etag !== savedData.etag
+            )) {
+                window.saveManager.localStorageManager.saveData({
+                    ...savedData,
+                    ...version
+                });
+            }
             
             if (result.success && result.response) {
                 // Add the personalized greeting to the chat
@@ -93,6 +93,10 @@ class SaveManager {
             const result = this.localStorageManager.saveData({
                 extracted_data: data.data?.extracted_data || {},
                 phase: data.data?.phase || '',
+                lineage: data.data?.lineage || null,
+                revision: data.data?.revision ?? null,
+                etag: data.data?.etag || null,
+                welcome_back: data.data?.welcome_back || null,
                 timestamp: new Date().toISOString()
             });
             return result;
@@ -103,6 +107,134 @@ class SaveManager {
     }
 
     
+    /**
+     * Apply a save response from the server to the locally stored data
+     * @param {Object|null} storedData - Locally stored data the delta is based on
+     * @param {Object} data - The "data" field of the /api/save response
+     * @returns {Object} Updated data in the shape expected by saveToLocal
+     */
+    applyDelta(storedData, data) {
+        const delta = data.delta || {};
+        let extractedData;
+
+        if (delta.full) {
+            extractedData = delta.extracted_data || {};
+        } else {
+            // Copy the stored data and overwrite only the changed items
+            extractedData = JSON.parse(JSON.stringify(storedData?.extracted_data || {}));
+            for (const [category, changes] of Object.entries(delta.changes || {})) {
+                const items = extractedData[category] || (extractedData[category] = []);
+                for (const [index, item] of changes) {
+                    items[index] = item;
+                }
+            }
+        }
+
+        // Keep a stored greeting only if it was made for exactly this data
+        let welcomeBack = data.welcome_back || storedData?.welcome_back || null;
+        if (welcomeBack && (welcomeBack.etag !== data.etag || welcomeBack.phase !== data.phase)) {
+            welcomeBack = null;
+        }
+
+        return {
+            data: {
+                extracted_data: extractedData,
+                phase: data.phase,
+                lineage: data.lineage,
+                revision: data.revision,
+                etag: data.etag,
+                welcome_back: welcomeBack
+            }
+        };
+    }
+
+    /**
+     * Fetch the welcome-back greeting the server precomputes after a save and
+     * store it with the saved data, so a later restore does not wait for the model.
+     * Polls briefly while the greeting is still being generated.
+     * @param {number} attempts - Number of polls before giving up
+     * @param {number} interval - Milliseconds between polls
+     */
+    async fetchWelcomeBack(attempts = 10, interval = 2000) {
+        for (let attempt = 0; attempt < attempts; attempt++) {
+            const storedData = this.localStorageManager.loadData().data;
+            if (!storedData) {
+                return;
+            }
+            const current = storedData.welcome_back;
+            if (current && current.etag === storedData.etag && current.phase === storedData.phase) {
+                return;
+            }
+
+            try {
+                const response = await fetch('/api/welcome_back');
+                if (!response.ok) {
+                    return;
+                }
+                const result = await response.json();
+
+                if (result.success) {
+                    // The data may have been saved again while polling
+                    const welcomeBack = result.welcome_back;
+                    const latest = this.localStorageManager.loadData().data;
+                    if (latest && welcomeBack.etag === latest.etag && welcomeBack.phase === latest.phase) {
+                        this.localStorageManager.saveData({ ...latest, welcome_back: welcomeBack });
+                        return;
+                    }
+                } else if (!result.pending) {
+                    return;
+                }
+            } catch (error) {
+                console.warn('Could not fetch welcome back message:', error);
+                return;
+            }
+
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    }
+
+    /**
+     * Restore saved data on the server. Only the version is sent first; the
+     * full data is uploaded when the server does not already hold it.
+     * @param {Object} savedData - Locally saved data
+     * @returns {Promise<Response>} The server's response
+     */
+    async postLoadContext(savedData) {
+        const { lineage, revision, etag, phase } = savedData;
+        if (lineage && etag) {
+            const response = await this.postJson('/api/load_context', {
+                version: { lineage, revision, etag, phase }
+            });
+            if (!response.ok) {
+                return response;
+            }
+            const result = await response.clone().json();
+            if (!result.needs_data) {
+                return response;
+            }
+        }
+        return this.postJson('/api/load_context', { saved_data: savedData });
+    }
+
+    /**
+     * POST a JSON payload, gzip-compressing it when the browser supports it
+     * @param {string} url - Endpoint to post to
+     * @param {Object} payload - Data to send
+     * @returns {Promise<Response>} The fetch response
+     */
+    async postJson(url, payload) {
+        const headers = { 'Content-Type': 'application/json' };
+        let body = JSON.stringify(payload);
+
+        if (typeof CompressionStream !== 'undefined') {
+            const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+            body = await new Response(stream).arrayBuffer();
+            headers['Content-Encoding'] = 'gzip';
+        }
+
+        return fetch(url, { method: 'POST', headers, body });
+    }
+
     /**
      * Save data to cloud (placeholder)
      * @param {Object} data - Data to save
@@ -219,15 +351,7 @@ class SaveManager {
             }
             
             // Send to backend API automatically
-            const response = await fetch('/api/load_context', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                saved_data: storedData.data
-            })
-            });
+            const response = await this.postLoadContext(storedData.data);
             
             if (!response.ok) {
             throw new Error(`Server responded with status: ${response.status}`);
@@ -307,13 +431,23 @@ class SaveManager {
             } else {
                 // For local/session storage, we need to get the data from the server first
                 this.updateSaveStatus('saving', 'Fetching data...');
-                
-                const response = await fetch('/api/save', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    }
-                });
+
+                // Tell the server which version we already have so it only sends changes
+                const storedData = this.localStorageManager.loadData().data;
+                const version = storedData ? {
+                    lineage: storedData.lineage,
+                    revision: storedData.revision,
+                    etag: storedData.etag,
+                    phase: storedData.phase
+                } : null;
+
+                const response = await this.postJson('/api/save', { version });
+
+                if (response.status === 304) {
+                    this.updateSaveStatus('success', '✓ Already up to date');
+                    this.fetchWelcomeBack();
+                    return;
+                }
                 
                 if (!response.ok) {
                     throw new Error(`Server responded with status: ${response.status}`);
@@ -322,9 +456,10 @@ class SaveManager {
                 const data = await response.json();
                 
                 // Process the data with our local save methods
-                if (data.extraction_status === 'complete') {
-                    // Save the extracted data locally
-                    await this.saveConversation(data);
+                if (data.data && data.extraction_status !== 'failed') {
+                    // Merge the changes into the stored data and save it locally
+                    await this.saveConversation(this.applyDelta(storedData, data.data));
+                    this.fetchWelcomeBack();
                 } else {
                     console.error('Extraction failed:', data.error);
                     this.updateSaveStatus('error', data.error || 'Failed to extract data');
@@ -0,0 +1,12 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Configure the app before it is imported: a dummy key, keep history in memory
+# and build static assets outside the source tree
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ.setdefault("FDA_TRANSCRIPT_DIR", "")
+os.environ.setdefault("FDA_ASSET_BUILD_DIR", tempfile.mkdtemp(prefix="fda-assets-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+# tests/test_dedup.py
+import pytest
+
+from modules.data_extractor import FamilyDataExtractor
+
+
+def merge(category, first, second):
+    """Add two items of one category and return the texts that were kept."""
+    extractor = FamilyDataExtractor()
+    extractor._update_family_data({category: [first]})
+    extractor._update_family_data({category: [second]})
+    field = "pattern" if category == "dynamics" else "description"
+    return [item[field] for item in extractor.family_data[category]]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("father rarely speaks at dinner", "Dad is quiet during dinners"),
+        ("mother and father argue about money", "Mom and dad have arguments about money"),
+    ],
+)
+def test_paraphrased_dynamics_merge(first, second):
+    kept = merge(
+        "dynamics",
+        {"type": "communication", "pattern": first},
+        {"type": "communication", "pattern": second},
+    )
+    assert kept == [first]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("father yells at son", "son yells at father"),
+        ("father rarely speaks at dinner", "father is not quiet at dinner"),
+        ("father rarely speaks at dinner", "father isn't quiet at dinner"),
+    ],
+)
+def test_distinct_dynamics_are_kept(first, second):
+    kept = merge(
+        "dynamics",
+        {"type": "communication", "pattern": first},
+        {"type": "communication", "pattern": second},
+    )
+    assert kept == [first, second]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("parents divorced in 2010", "parents divorced in 2015"),
+        ("grandmother died at 80", "grandmother died at 85"),
+    ],
+)
+def test_events_with_different_numbers_are_kept(first, second):
+    kept = merge(
+        "events",
+        {"type": "family_event", "description": first},
+        {"type": "family_event", "description": second},
+    )
+    assert kept == [first, second]
+
+
+def test_events_with_same_year_merge():
+    kept = merge(
+        "events",
+        {"type": "divorce", "description": "parents divorced in 2010"},
+        {"type": "divorce", "description": "The parents got divorced in 2010"},
+    )
+    assert kept == ["parents divorced in 2010"]
+
+
+def test_textless_items_deduplicate_exactly():
+    extractor = FamilyDataExtractor()
+    for _ in range(3):
+        extractor._update_family_data({"events": [{"type": "move", "members": ["mother"]}]})
+    assert extractor.family_data["events"] == [{"type": "move", "members": ["mother"]}]
+    assert extractor.revision == 1
@@ -0,0 +1,24 @@
+# tests/test_genogram.py
+import pytest
+
+from modules.genogram import role_generation
+
+
+@pytest.mark.parametrize(
+    "role, generation",
+    [
+        ("great-grandmother", 0),
+        ("grandfather", 0),
+        ("great aunt", 0),
+        ("mother", 1),
+        ("uncle", 1),
+        ("older sister", 2),
+        ("son", 2),
+        ("grandson", 3),
+        ("great-grandson", 3),
+        ("great granddaughter", 3),
+        ("neighbor", None),
+    ],
+)
+def test_role_generation(role, generation):
+    assert role_generation(role) == generation
@@ -0,0 +1,81 @@
+# tests/test_session_cost.py
+import os
+import gc
+import logging
+import types
+import tracemalloc
+
+import pytest
+
+import app as app_module
+from modules.model_router import get_router
+
+# Upper bound on memory per session; measured at about 1.5KB
+MAX_BYTES_PER_SESSION = 3072
+SESSIONS = 200
+
+
+class StubMessages:
+    """Records calls instead of reaching the API."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text="Hello")],
+            usage=types.SimpleNamespace(input_tokens=1, output_tokens=1),
+        )
+
+
+class StubClient:
+    def __init__(self):
+        self.messages = StubMessages()
+
+    def with_options(self, **kwargs):
+        return self
+
+
+@pytest.fixture
+def client(monkeypatch):
+    stub = StubClient()
+    monkeypatch.setattr(get_router(os.environ["ANTHROPIC_API_KEY"]), "_client", stub)
+    monkeypatch.setattr(app_module, "sessions", {})
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as test_client:
+        test_client.stub = stub
+        yield test_client
+
+
+def test_index_creates_no_conversation(client):
+    response = client.get("/")
+
+    assert response.status_code == 200
+    with client.session_transaction() as flask_session:
+        assert "session_id" in flask_session
+    assert app_module.sessions == {}
+    assert client.stub.messages.calls == []
+
+
+def test_conversation_memory_per_session(client):
+    # Fill the shared prompt caches first so they are not charged to the sessions
+    app_module.get_or_create_conversation("warm-up")
+    app_module.sessions.clear()
+    # Captured log records would otherwise be counted as session memory
+    logging.disable(logging.INFO)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for i in range(SESSIONS):
+            app_module.get_or_create_conversation(f"session-{i}")
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+    assert len(app_module.sessions) == SESSIONS
+    assert client.stub.messages.calls == []
+    assert (after - before) / SESSIONS < MAX_BYTES_PER_SESSION
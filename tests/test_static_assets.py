@@ -0,0 +1,44 @@
+# tests/test_static_assets.py
+import gzip
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def asset_path():
+    return "/assets/" + app_module.asset_pipeline.manifest["save_data.js"]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip, deflate", "gzip"),
+        ("*", "gzip"),
+        ("gzip;q=0, identity", None),
+        ("identity, *;q=0", None),
+        ("", None),
+    ],
+)
+def test_encoding_respects_quality(client, asset_path, accept_encoding, expected):
+    response = client.get(asset_path, headers={"Accept-Encoding": accept_encoding})
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == expected
+    assert "Accept-Encoding" in response.headers["Vary"]
+    body = gzip.decompress(response.data) if expected == "gzip" else response.data
+    assert b"class SaveManager" in body
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".br"])
+def test_compressed_variants_are_not_routable(client, asset_path, suffix):
+    assert client.get(asset_path + suffix).status_code == 404
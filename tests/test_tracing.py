@@ -0,0 +1,46 @@
+# tests/test_tracing.py
+import json
+import threading
+
+from modules.tracing import JsonLinesSpanExporter, QueuedSpanExporter, Tracer
+
+
+class BlockingExporter(JsonLinesSpanExporter):
+    """Writes only once released, to show the request thread does not wait for it."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.release = threading.Event()
+
+    def export(self, spans):
+        self.release.wait(5)
+        super().export(spans)
+
+
+def test_traces_are_written_off_the_request_thread(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    writer = BlockingExporter(str(path))
+    exporter = QueuedSpanExporter(writer)
+    tracer = Tracer(exporter=exporter, sample_rate=1)
+
+    with tracer.start_as_current_span("request"):
+        with tracer.start_as_current_span("child"):
+            pass
+
+    # The root span has ended but nothing was written on this thread
+    assert not path.exists()
+
+    writer.release.set()
+    exporter.shutdown()
+    names = [json.loads(line)["name"] for line in path.read_text().splitlines()]
+    assert names == ["child", "request"]
+
+
+def test_unsampled_traces_start_no_thread(tmp_path):
+    exporter = QueuedSpanExporter(JsonLinesSpanExporter(str(tmp_path / "traces.jsonl")))
+    tracer = Tracer(exporter=exporter, sample_rate=0)
+
+    with tracer.start_as_current_span("request"):
+        pass
+
+    assert exporter._thread is None